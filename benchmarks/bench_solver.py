@@ -0,0 +1,175 @@
+#! /usr/bin/env python
+""" Times level loading and solving, and writes the results as JSON.
+
+Usage: python benchmarks/bench_solver.py [-o results.json] [--sizes 50,200,1000]
+
+Every shipped level is timed in four stages: reading and parsing the level
+file, building the level graph, building the solver, and solving it.  Then
+the same is done for synthetic grids of the given sizes, which also report
+the number of states expanded per second and the peak memory use, as
+measured by tracemalloc in a separate run.  Searches that run over the time
+limit are cancelled and recorded as such.  Use compare.py to compare two
+result files; the results directory holds a run of the bfs and numpy
+engines.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from game.level import Level
+from game.solver import ENGINES
+from synthetic import DEFAULT_DENSITIES, synthetic_rows
+
+from glob import glob
+import argparse
+import json
+import platform
+import subprocess
+import threading
+import time
+import tracemalloc
+
+
+LEVELS_DIR = os.path.join(os.path.dirname(__file__), '..', 'levels')
+
+
+def run_case(load, engine, timeout=None):
+    """ Loads a level with the given function, which shouldn't build the
+    graph yet, and solves it, returning the timings of each stage.  Errors
+    are recorded rather than raised. """
+
+    result = {}
+    cancel = threading.Event()
+    timer = None
+
+    try:
+        start_time = time.perf_counter()
+        level = load()
+        read_time = time.perf_counter()
+        level.build_graph()
+        graph_time = time.perf_counter()
+        solver = level.get_solver()
+        solver_time = time.perf_counter()
+
+        if timeout is not None:
+            timer = threading.Timer(timeout, cancel.set)
+            timer.start()
+
+        solutions = solver.solve(engine=engine, cancel=cancel)
+        solve_time = time.perf_counter()
+
+    except Exception as ex:
+        result['error'] = "{0}: {1}".format(type(ex).__name__, ex)
+        return result
+
+    finally:
+        if timer is not None:
+            timer.cancel()
+
+    result['read_time'] = read_time - start_time
+    result['graph_time'] = graph_time - read_time
+    result['solver_time'] = solver_time - graph_time
+    result['solve_time'] = solve_time - solver_time
+    result['cells'] = solver.num_cells
+    result['expanded'] = solver.expanded
+    result['states_per_sec'] = solver.expanded / max(solve_time - solver_time, 1e-9)
+    if cancel.is_set():
+        result['timeout'] = True
+    else:
+        result['moves'] = len(solutions[0]) if solutions else None
+    return result
+
+
+def measure_memory(load, engine, timeout=None):
+    "Runs the case again under tracemalloc, returning the peak in bytes."
+
+    tracemalloc.start()
+    try:
+        run_case(load, engine, timeout)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench(name, load, engine, repeat, timeout, memory):
+    # Keep the fastest of a few runs, which is the least noisy.
+    best = None
+    for i in range(repeat):
+        result = run_case(load, engine, timeout)
+        if 'error' in result or result.get('timeout'):
+            best = result
+            break
+        if best is None or result['solve_time'] < best['solve_time']:
+            best = result
+
+    if memory and 'error' not in best:
+        best['peak_memory'] = measure_memory(load, engine, timeout)
+
+    best['name'] = name
+    best['engine'] = engine
+    print(json.dumps(best), file=sys.stderr)
+    return best
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(__file__) or '.', stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the level loader and solver.")
+    parser.add_argument('-o', '--output', default='bench_results.json', help="file to write the results to")
+    parser.add_argument('--engine', choices=ENGINES, default='bfs')
+    parser.add_argument('--sizes', default='50,200,1000', help="comma-separated sizes of the synthetic grids")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per shipped level")
+    parser.add_argument('--timeout', type=float, default=60.0, help="seconds before a synthetic search is cancelled")
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help="skip measuring peak memory")
+    for key, value in DEFAULT_DENSITIES.items():
+        parser.add_argument('--' + key, type=float, default=value, help="density of {0} in synthetic grids".format(key))
+    args = parser.parse_args(argv)
+
+    results = {
+        'commit': get_commit(),
+        'python': platform.python_version(),
+        'engine': args.engine,
+        'levels': [],
+        'synthetic': [],
+    }
+
+    for fn in sorted(glob(os.path.join(LEVELS_DIR, '*.lvl'))):
+        def load(fn=fn):
+            level = Level()
+            level.read(fn, build_graph=False)
+            return level
+
+        name = os.path.splitext(os.path.basename(fn))[0]
+        results['levels'].append(bench(name, load, args.engine, args.repeat, None, args.memory))
+
+    densities = {key: getattr(args, key) for key in DEFAULT_DENSITIES}
+    results['densities'] = densities
+
+    for size in args.sizes.split(','):
+        size = int(size)
+        rows = synthetic_rows(size, size, densities)
+
+        def load(rows=rows):
+            level = Level()
+            level.parse(rows, build_graph=False)
+            return level
+
+        name = '{0}x{0}'.format(size)
+        results['synthetic'].append(bench(name, load, args.engine, 1, args.timeout, args.memory))
+
+    with open(args.output, 'w') as fp:
+        json.dump(results, fp, indent=4)
+        fp.write('\n')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,52 @@
+#! /usr/bin/env python
+""" Compares two result files written by bench_solver.py.
+
+Usage: python benchmarks/compare.py OLD.json NEW.json
+
+Prints the ratio of new to old time for every stage of every benchmark, so
+values below 1.0 are improvements.
+"""
+
+import json
+import sys
+
+
+STAGES = ('read_time', 'graph_time', 'solver_time', 'solve_time', 'peak_memory')
+
+
+def compare(old, new):
+    print("{0:<12} {1}".format('name', ' '.join('{0:>12}'.format(stage) for stage in STAGES)))
+
+    for section in ('levels', 'synthetic'):
+        old_results = {result['name']: result for result in old.get(section, ())}
+        for result in new.get(section, ()):
+            old_result = old_results.get(result['name'])
+            if old_result is None:
+                continue
+
+            columns = []
+            for stage in STAGES:
+                if stage in result and old_result.get(stage):
+                    columns.append('{0:>12.2f}'.format(result[stage] / old_result[stage]))
+                else:
+                    columns.append('{0:>12}'.format('-'))
+            print("{0:<12} {1}".format(result['name'], ' '.join(columns)))
+
+
+def main(argv=None):
+    args = sys.argv[1:] if argv is None else argv
+    if len(args) != 2:
+        print(__doc__.strip(), file=sys.stderr)
+        return 2
+
+    with open(args[0]) as fp:
+        old = json.load(fp)
+    with open(args[1]) as fp:
+        new = json.load(fp)
+
+    compare(old, new)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
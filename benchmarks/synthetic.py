@@ -0,0 +1,57 @@
+""" Builds large synthetic levels for benchmarking the solver.
+
+The grid is filled with plain tiles, with the entrance in one corner and the
+exit in the opposite one, so that the solver has to search most of it.  A
+fraction of the tiles is then replaced by gates, ice, teleporters, buttons
+and toggled tiles, according to the given densities.
+"""
+
+__all__ = ["DEFAULT_DENSITIES", "synthetic_rows"]
+
+import random
+
+
+DEFAULT_DENSITIES = {
+    'gates': 0.05,
+    'ice': 0.02,
+    'teleporters': 0.001,
+    'buttons': 0.002,
+    'toggles': 0.02,
+}
+
+
+def synthetic_rows(width, height, densities=DEFAULT_DENSITIES, seed=0):
+    "Returns the rows of a synthetic level, which can be passed to Level.parse."
+
+    rng = random.Random(seed)
+    grid = [['.'] * width for y in range(height)]
+
+    cells = [(x, y) for y in range(height) for x in range(width)]
+    cells.remove((0, 0))
+    cells.remove((width - 1, height - 1))
+    rng.shuffle(cells)
+
+    def take(density):
+        count = int(len(cells) * density)
+        taken = cells[-count:] if count else []
+        del cells[len(cells) - count:]
+        return taken
+
+    for x, y in take(densities.get('gates', 0)):
+        grid[y][x] = rng.choice('123456')
+    for x, y in take(densities.get('ice', 0)):
+        grid[y][x] = 's'
+    for x, y in take(densities.get('buttons', 0)):
+        grid[y][x] = 'o'
+    for x, y in take(densities.get('toggles', 0)):
+        grid[y][x] = rng.choice('/\\')
+
+    # Teleporters only make sense with at least two of them.
+    teleporters = take(densities.get('teleporters', 0))
+    if len(teleporters) >= 2:
+        for x, y in teleporters:
+            grid[y][x] = 't'
+
+    grid[0][0] = 'b'
+    grid[height - 1][width - 1] = 'e'
+    return [''.join(row) for row in grid]
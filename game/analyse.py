@@ -0,0 +1,144 @@
+""" Measures how hard levels are, to help with ordering the level packs.
+
+Usage: python -m game.analyse [--format csv|json] [--sort FIELD] [-o FILE] PATH...
+
+For each level, the whole reachable state space is explored, and the report
+lists its size, the average number of moves available in each state, how
+many states are dead ends (from which no exit can be reached any more), the
+number of optimal solutions and the time taken to find one.  All of that is
+worked out from a single solver per level, in a pool of worker processes.
+"""
+
+__all__ = ["FIELDS", "explore", "analyse_level", "main"]
+
+from .level import Level
+from .validate import find_levels
+
+from multiprocessing import Pool
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+
+FIELDS = ('level', 'par', 'optimal', 'solutions', 'states', 'branching', 'dead_ends', 'solve_time')
+
+
+def explore(solver):
+    """ Visits every state that can be reached from the start.  Returns the
+    number of states, the average branching factor and the number of dead
+    ends.  States on an exit tile end the level, so they aren't expanded. """
+
+    cell_mask = (1 << solver.cell_bits) - 1
+    successors = solver.successors
+    exits = solver.exits
+
+    start = solver.pack(0, 0, 0, solver.crack_bits[0])
+    index = {start: 0}
+    states = [start]
+
+    # For each state, the indices of the states that lead into it.
+    entries = [[]]
+
+    num_moves = 0
+    num_expanded = 0
+    i = 0
+    while i < len(states):
+        state = states[i]
+        if not exits[state & cell_mask]:
+            num_expanded += 1
+            for dir, nstate in successors(state):
+                j = index.get(nstate)
+                if j is None:
+                    j = len(states)
+                    index[nstate] = j
+                    states.append(nstate)
+                    entries.append([])
+                entries[j].append(i)
+                num_moves += 1
+        i += 1
+
+    # Flood backwards from the exits to find the states that aren't lost.
+    alive = bytearray(len(states))
+    stack = [i for i, state in enumerate(states) if exits[state & cell_mask]]
+    for i in stack:
+        alive[i] = 1
+    while stack:
+        for j in entries[stack.pop()]:
+            if not alive[j]:
+                alive[j] = 1
+                stack.append(j)
+
+    branching = num_moves / num_expanded if num_expanded else 0.0
+    return len(states), branching, len(states) - sum(alive)
+
+
+def analyse_level(fn):
+    "Returns a dict with the FIELDS for the given level file."
+
+    level = Level()
+    level.read(fn)
+    solver = level.get_solver()
+
+    start_time = time.perf_counter()
+    solutions = solver.solve()
+    solve_time = time.perf_counter() - start_time
+
+    num_states, branching, dead_ends = explore(solver)
+
+    return {
+        'level': os.path.splitext(os.path.basename(fn))[0],
+        'par': level.par,
+        'optimal': len(solutions[0]) if solutions else None,
+        'solutions': solver.count_solutions(),
+        'states': num_states,
+        'branching': round(branching, 3),
+        'dead_ends': dead_ends,
+        'solve_time': round(solve_time, 6),
+    }
+
+
+def _sort_key(field):
+    # Puts levels without a value (eg. no par) at the end.
+    def key(row):
+        value = row[field]
+        return (value is None, value if value is not None else 0)
+    return key
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m game.analyse', description="Reports on the difficulty of levels.")
+    parser.add_argument('paths', nargs='+', metavar='PATH', help="level file, or directory of .lvl files")
+    parser.add_argument('--format', choices=('csv', 'json'), default='csv')
+    parser.add_argument('--sort', choices=FIELDS, default='level', help="field to sort the report by")
+    parser.add_argument('--reverse', action='store_true', help="sort in descending order")
+    parser.add_argument('-o', '--output', default=None, help="file to write to (default: stdout)")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="number of worker processes (default: one per core)")
+    args = parser.parse_args(argv)
+
+    files = find_levels(args.paths)
+    with Pool(args.jobs) as pool:
+        rows = pool.map(analyse_level, files, chunksize=max(1, len(files) // 256))
+
+    rows.sort(key=_sort_key(args.sort), reverse=args.reverse)
+
+    fp = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        if args.format == 'json':
+            json.dump(rows, fp, indent=4)
+            fp.write('\n')
+        else:
+            writer = csv.DictWriter(fp, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+    finally:
+        if fp is not sys.stdout:
+            fp.close()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
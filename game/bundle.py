@@ -0,0 +1,248 @@
+""" Level pack bundles, which hold all the levels of a pack in a single file.
+
+Usage: python -m game.bundle [--solution] [-o OUTDIR] [LEVELSDIR]
+
+A bundle starts with an index of level names, each with the offset and size
+of the compiled level (see game.lvlc) within the file.  The bundles are read
+into memory once, and the levels are loaded straight out of that memory.
+
+The LevelLibrary looks through the level directories once, when it is
+created, remembers where each level was found, and keeps the most recently
+used levels in memory.  Loose .lvl and .lvlc
+files take precedence over a bundle in the same directory if they are newer
+than it, so that modders can still edit the level files.
+"""
+
+__all__ = ["LevelBundle", "LevelLibrary", "write_bundle", "main"]
+
+from .level import Level
+from . import lvlc
+from .packs import level_packs
+
+from collections import OrderedDict
+import argparse
+import os
+import struct
+import sys
+import threading
+
+
+BUNDLE_EXT = '.lvlpack'
+MAGIC = b'LVLB'
+
+# Bump this whenever the layout changes, or that of the compiled levels.
+BUNDLE_VERSION = 2
+
+# Magic, version, number of levels, followed by an index entry for each
+# level: the length of the name, then the offset and the size of the compiled
+# level, then the name itself, padded to a multiple of four bytes.
+HEADER = struct.Struct('<4sHxxI')
+INDEX_ENTRY = struct.Struct('<III')
+
+
+def _pad(size):
+    return (size + 3) & ~3
+
+
+def write_bundle(fn, levels, solution=False):
+    """ Writes a bundle with the given list of (name, level file) tuples.
+    If solution is true, an optimal solution is included for each level. """
+
+    blobs = [lvlc.dump_level_file(level_file, solution) for name, level_file in levels]
+    names = [name.encode('utf-8') for name, level_file in levels]
+
+    offset = HEADER.size + sum(INDEX_ENTRY.size + _pad(len(name)) for name in names)
+
+    with open(fn, 'wb') as fp:
+        fp.write(HEADER.pack(MAGIC, BUNDLE_VERSION, len(levels)))
+        for name, blob in zip(names, blobs):
+            fp.write(INDEX_ENTRY.pack(len(name), offset, len(blob)))
+            fp.write(name.ljust(_pad(len(name)), b'\0'))
+            offset += _pad(len(blob))
+
+        for blob in blobs:
+            fp.write(blob.ljust(_pad(len(blob)), b'\0'))
+
+
+class LevelBundle:
+    """ A bundle file, held in memory.  Raises ValueError if the file is not
+    a bundle. """
+
+    def __init__(self, fn):
+        self.path = fn
+
+        with open(fn, 'rb') as fp:
+            self.data = memoryview(fp.read())
+            self.mtime = os.fstat(fp.fileno()).st_mtime
+
+        if len(self.data) < HEADER.size:
+            raise ValueError("{0} is not a level bundle".format(fn))
+
+        magic, version, count = HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            raise ValueError("{0} is not a level bundle".format(fn))
+        if version != BUNDLE_VERSION:
+            raise ValueError("{0} has unsupported version {1}".format(fn, version))
+
+        # Maps each level name to its (offset, size).
+        self.index = {}
+        pos = HEADER.size
+        for i in range(count):
+            name_size, offset, size = INDEX_ENTRY.unpack_from(self.data, pos)
+            pos += INDEX_ENTRY.size
+            name = bytes(self.data[pos:pos + name_size]).decode('utf-8')
+            pos += _pad(name_size)
+            self.index[name] = (offset, size)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def get_names(self):
+        return list(self.index)
+
+    def load_level(self, name):
+        "Returns a new Level for the level with the given name."
+
+        offset, size = self.index[name]
+        return lvlc.load_compiled(self.data[offset:offset + size], "{0}:{1}".format(self.path, name))
+
+
+class LevelLibrary:
+    """ Finds levels by name in the given directories, which are searched in
+    order.  The directories are only listed once, and the place each level
+    was found is cached, so loading a level doesn't need to touch the file
+    system unless it comes from a loose file. """
+
+    def __init__(self, dirs, cache_size=8):
+        self.dirs = []
+        self.resolved = {}
+
+        # The most recently used levels, by (name, mtime), as they were read.
+        self.templates = OrderedDict()
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+
+        for dir in dirs:
+            try:
+                names = os.listdir(dir)
+            except OSError:
+                continue
+
+            # Maps each file name to its modification time.
+            files = {}
+            bundles = []
+            for name in names:
+                path = os.path.join(dir, name)
+                if name.endswith(BUNDLE_EXT):
+                    try:
+                        bundles.append(LevelBundle(path))
+                    except (IOError, ValueError) as ex:
+                        print("Ignoring level bundle {0}: {1}".format(path, ex))
+                elif name.endswith('.lvl') or name.endswith('.lvlc'):
+                    files[name] = os.path.getmtime(path)
+
+            bundles.sort(key=lambda bundle: bundle.path)
+            self.dirs.append((dir, files, bundles))
+
+    def resolve(self, name):
+        """ Returns where the level with the given name is loaded from, as a
+        LevelBundle or the path of a level file, or None if it can't be found.
+        The result is cached. """
+
+        if name in self.resolved:
+            return self.resolved[name]
+
+        source = None
+        for dir, files, bundles in self.dirs:
+            lvl_mtime = files.get(name + '.lvl')
+            lvlc_mtime = files.get(name + '.lvlc')
+            if lvlc_mtime is not None and (lvl_mtime is None or lvlc_mtime >= lvl_mtime):
+                source, mtime = os.path.join(dir, name + '.lvlc'), lvlc_mtime
+            elif lvl_mtime is not None:
+                source, mtime = os.path.join(dir, name + '.lvl'), lvl_mtime
+
+            for bundle in bundles:
+                if name in bundle and (source is None or bundle.mtime >= mtime):
+                    source = bundle
+                    break
+
+            if source is not None:
+                break
+
+        self.resolved[name] = source
+        return source
+
+    def load_level(self, name):
+        """ Returns a new Level with the given name, ready to be played.
+        Raises IOError if it can't be found, or ValueError if it can't be
+        read.  Recently loaded levels are kept around, so that they can be
+        handed out again without reading them, unless the file has changed. """
+
+        source = self.resolve(name)
+        if source is None:
+            raise IOError("No level named {0}".format(name))
+
+        if isinstance(source, LevelBundle):
+            mtime = source.mtime
+        else:
+            mtime = os.path.getmtime(source)
+
+        key = (name, mtime)
+        with self.lock:
+            template = self.templates.get(key)
+            if template is not None:
+                self.templates.move_to_end(key)
+
+        if template is None:
+            template = self._read_level(name, source)
+
+            # Set up the solver now, so that all copies share it, along with
+            # the distance table once any of them has built it.
+            template.get_solver()
+
+            with self.lock:
+                self.templates[key] = template
+                while len(self.templates) > self.cache_size:
+                    self.templates.popitem(last=False)
+
+        return template.copy()
+
+    def _read_level(self, name, source):
+        if isinstance(source, LevelBundle):
+            return source.load_level(name)
+
+        if source.endswith('.lvlc'):
+            try:
+                return lvlc.read_compiled(source)
+            except ValueError as ex:
+                # Perhaps it was compiled by another version; use the source.
+                if not os.path.isfile(source[:-1]):
+                    raise
+                print("Ignoring compiled level {0}: {1}".format(source, ex))
+                source = source[:-1]
+
+        level = Level()
+        level.read(source)
+        return level
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m game.bundle', description="Builds a bundle for each level pack.")
+    parser.add_argument('levels', nargs='?', default='levels', metavar='LEVELSDIR', help="directory with the .lvl files")
+    parser.add_argument('-o', '--output', default=None, help="directory to write to (default: LEVELSDIR)")
+    parser.add_argument('--solution', action='store_true', help="include an optimal solution for each level")
+    args = parser.parse_args(argv)
+
+    output = args.output or args.levels
+    os.makedirs(output, exist_ok=True)
+
+    for pack_name, names in level_packs:
+        fn = os.path.join(output, pack_name + BUNDLE_EXT)
+        write_bundle(fn, [(name, os.path.join(args.levels, name + '.lvl')) for name in names], args.solution)
+        print(fn)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+__all__ = ["SolverCache", "SolverResult"]
+
+from collections import namedtuple
+import json
+import os
+
+
+# Bump this whenever a change to the solver could change its results.
+CACHE_VERSION = 1
+
+SolverResult = namedtuple('SolverResult', ('par', 'solution', 'count', 'explored'))
+
+
+def get_default_path():
+    "Returns the location of the cache file in the user appdata directory."
+
+    try:
+        from panda3d.core import Filename
+    except ImportError:
+        appdata = os.environ.get('APPDATA') or os.environ.get('XDG_DATA_HOME') or \
+            os.path.join(os.path.expanduser('~'), '.local', 'share')
+    else:
+        appdata = Filename.get_user_appdata_directory().to_os_specific()
+
+    return os.path.join(appdata, 'hexima', 'solver-cache.json')
+
+
+def compute_result(level):
+    "Solves the level and returns a SolverResult."
+
+    solver = level.get_solver()
+    solutions = solver.solve()
+    explored = solver.expanded
+    if solutions:
+        return SolverResult(len(solutions[0]), solutions[0], solver.count_solutions(), explored)
+    else:
+        return SolverResult(None, None, 0, explored)
+
+
+class SolverCache:
+    """ Remembers the solver results for levels across runs.  Entries are
+    keyed by the hash of the level layout, so an edited level file simply
+    misses the cache and gets solved again. """
+
+    def __init__(self, path=None):
+        self.path = path or get_default_path()
+        self.entries = {}
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        try:
+            data = json.load(open(self.path, 'r'))
+        except (IOError, ValueError):
+            return
+
+        if isinstance(data, dict) and data.get('version') == CACHE_VERSION:
+            self.entries = data.get('levels', {})
+
+    def save(self):
+        if not self.dirty:
+            return
+
+        data = {'version': CACHE_VERSION, 'levels': self.entries}
+
+        # Write to a temporary file first, so that we never leave a partially
+        # written cache behind.
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as fp:
+            json.dump(data, fp, separators=(',', ':'), sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def get(self, level):
+        "Returns the SolverResult for the level, solving it if necessary."
+
+        key = level.get_hash()
+        entry = self.entries.get(key)
+        if entry is not None:
+            return SolverResult(*entry)
+
+        result = compute_result(level)
+        self.put(key, result)
+        return result
+
+    def put(self, key, result):
+        "Stores a result that was computed elsewhere, eg. in another process."
+
+        self.entries[key] = list(result)
+        self.dirty = True
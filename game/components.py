@@ -165,6 +165,7 @@ class Symbol:
         self.node = core.TextNode("")
         self.node.text = text
         self.node.align = core.TextNode.A_center
+        self.path = None
 
         if font is not None:
             self.node.font = font
@@ -173,16 +174,24 @@ class Symbol:
             self.node.text_color = color
 
     def setup(self, world, ent):
+        # This is called again for every level, so only attach it once.
+        if self.path is not None:
+            return
+
         spatial = world.component_for_entity(ent, Spatial)
         path = spatial.path.attach_new_node(self.node)
         #path.set_shader_off(1)
         #path.set_light_off(1)
         path.set_hpr(0, -90, 0)
         path.set_pos(0, -0.25, -0.499)
+        self.path = path
 
 
 class Falling:
-    def __init__(self, drag=1.0, orientation=0.0):
+    def __init__(self, drag=1.0, orientation=0.0, keep=False):
         self.velocity = 0.0
         self.drag = drag
         self.orientation = orientation
+
+        # If set, the entity is stashed rather than deleted once out of sight.
+        self.keep = keep
@@ -13,51 +13,104 @@ sequences = [
 ]
 
 
+def _build_tables():
+    """ Numbers the 24 orientations of the die, starting with the default
+    one, by rolling it around until no new orientations turn up. """
+
+    # Each orientation is stored as (top, east, north); the opposite faces
+    # always add up to seven.
+    rolls = (
+        lambda t, e, n: (7 - n, e, t),  # north
+        lambda t, e, n: (7 - e, t, n),  # east
+        lambda t, e, n: (n, e, 7 - t),  # south
+        lambda t, e, n: (e, 7 - t, n),  # west
+    )
+
+    orientations = [(1, 4, 5)]
+    index = {orientations[0]: 0}
+    tables = ([], [], [], [])
+
+    i = 0
+    while i < len(orientations):
+        for table, roll in zip(tables, rolls):
+            key = roll(*orientations[i])
+            if key not in index:
+                index[key] = len(orientations)
+                orientations.append(key)
+            table.append(index[key])
+        i += 1
+
+    return orientations, index, tables
+
+
+# All 24 orientations as (top, east, north) tuples, and the reverse mapping.
+ORIENTATIONS, ORIENTATION_INDEX, ROLLS = _build_tables()
+
+# Orientation reached by rolling in a given direction, indexed by orientation.
+ROLL_NORTH, ROLL_EAST, ROLL_SOUTH, ROLL_WEST = ROLLS
+
+# Face numbers, indexed by orientation.
+TOP = tuple(o[0] for o in ORIENTATIONS)
+EAST = tuple(o[1] for o in ORIENTATIONS)
+NORTH = tuple(o[2] for o in ORIENTATIONS)
+BOTTOM = tuple(7 - o[0] for o in ORIENTATIONS)
+
+# The top and east faces are enough to pin down an orientation.
+_top_east_index = {(o[0], o[1]): i for i, o in enumerate(ORIENTATIONS)}
+
+
 class Die(object):
+    """ Wraps a single orientation number from 0 to 23, which can be used to
+    index the tables above directly. """
+
     def __init__(self):
         self.reset()
 
     def reset(self):
-        self.top_number = 1
-        self.east_number = 4
-        self.north_number = 5
+        self.orientation = 0
 
     def rotate_to(self, top_number, twist=0):
         assert top_number >= 1 and top_number <= 6
-        self.top_number = top_number
         seq = sequences[top_number - 1]
-        self.east_number = seq[twist % 4]
-        self.north_number = seq[(twist + 1) % 4]
+        self.orientation = _top_east_index[(top_number, seq[twist % 4])]
 
     def throw(self):
         num = randint(1, 6)
         rot = randint(0, 4)
         self.rotate_to(num, rot)
 
+    @property
+    def top_number(self):
+        return TOP[self.orientation]
+
+    @property
+    def east_number(self):
+        return EAST[self.orientation]
+
+    @property
+    def north_number(self):
+        return NORTH[self.orientation]
+
     @property
     def south_number(self):
-        return 7 - self.north_number
+        return 7 - NORTH[self.orientation]
 
     @property
     def west_number(self):
-        return 7 - self.east_number
+        return 7 - EAST[self.orientation]
 
     @property
     def bottom_number(self):
-        return 7 - self.top_number
+        return BOTTOM[self.orientation]
 
     def rotate_north(self):
-        self.top_number, self.north_number = \
-            self.south_number, self.top_number
+        self.orientation = ROLL_NORTH[self.orientation]
 
     def rotate_east(self):
-        self.top_number, self.east_number = \
-            self.west_number, self.top_number
+        self.orientation = ROLL_EAST[self.orientation]
 
     def rotate_south(self):
-        self.top_number, self.north_number = \
-            self.north_number, self.bottom_number
+        self.orientation = ROLL_SOUTH[self.orientation]
 
     def rotate_west(self):
-        self.top_number, self.east_number = \
-            self.east_number, self.bottom_number
+        self.orientation = ROLL_WEST[self.orientation]
@@ -0,0 +1,225 @@
+""" Generates random puzzles, keeping only those that meet a target par.
+
+Usage: python -m game.generate [options] -o OUTDIR
+
+Candidates are laid out by carving a random walk out of an empty grid and
+sprinkling it with special tiles.  Each one is checked with increasingly
+expensive tests: whether an exit can be reached at all, whether the relaxed
+lower bound fits the target par, and finally an actual solve.  The work is
+spread over a pool of worker processes, and every accepted puzzle is written
+as a regular .lvl file with the par filled in.
+"""
+
+__all__ = ["GeneratorOptions", "random_layout", "evaluate_layout", "generate_batch", "main"]
+
+from .level import Level, TileType, TILE_CODES
+
+from collections import namedtuple
+from itertools import accumulate
+from multiprocessing import Pool
+import argparse
+import os
+import random
+import sys
+import time
+
+
+GeneratorOptions = namedtuple('GeneratorOptions', (
+    'width', 'height', 'area', 'min_par', 'max_par', 'max_solutions',
+    'teleporter_chance',
+))
+
+# Relative odds of each tile type being placed along the walk.
+TILE_WEIGHTS = (
+    (TileType.blank, 16),
+    (TileType.gate1, 1),
+    (TileType.gate2, 1),
+    (TileType.gate3, 1),
+    (TileType.gate4, 1),
+    (TileType.gate5, 1),
+    (TileType.gate6, 1),
+    (TileType.cracked, 2),
+    (TileType.ice, 1),
+    (TileType.button, 1),
+    (TileType.active, 1),
+    (TileType.inactive, 1),
+)
+
+TILE_SYMBOLS = [type.value for type, weight in TILE_WEIGHTS]
+TILE_CUM_WEIGHTS = list(accumulate(weight for type, weight in TILE_WEIGHTS))
+
+
+def random_layout(rng, options):
+    "Returns the rows of a random, connected tile layout."
+
+    width = options.width
+    height = options.height
+    grid = [[' '] * width for y in range(height)]
+
+    x = rng.randrange(width)
+    y = rng.randrange(height)
+    grid[y][x] = 'b'
+    carved = [(x, y)]
+
+    # Wander around, putting down tiles where there aren't any yet.
+    steps = options.area * 8
+    while len(carved) < options.area and steps > 0:
+        steps -= 1
+        dx, dy = rng.choice(((0, 1), (1, 0), (0, -1), (-1, 0)))
+        x = min(max(x + dx, 0), width - 1)
+        y = min(max(y + dy, 0), height - 1)
+        if grid[y][x] == ' ':
+            grid[y][x] = rng.choices(TILE_SYMBOLS, cum_weights=TILE_CUM_WEIGHTS)[0]
+            carved.append((x, y))
+
+    if len(carved) < 3:
+        return None
+
+    # Put the exit somewhere in the latter half of the walk.
+    x, y = rng.choice(carved[len(carved) // 2:])
+    grid[y][x] = 'e'
+
+    if rng.random() < options.teleporter_chance:
+        free = [(x, y) for x, y in carved[1:] if grid[y][x] not in 'be']
+        if len(free) >= 2:
+            for x, y in rng.sample(free, 2):
+                grid[y][x] = 't'
+
+    rows = [''.join(row).rstrip() for row in grid]
+    while rows and not rows[-1]:
+        rows.pop()
+    return rows
+
+
+def evaluate_layout(rows, options):
+    """ Returns a Level with its par filled in if the layout meets the target,
+    or None if it is rejected.  The cheap checks come first. """
+
+    level = Level()
+    level.parse(rows)
+
+    # Is there an exit at all?  Whether it can be reached comes next.
+    graph = level.graph
+    if TILE_CODES[TileType.exit] not in graph.types:
+        return None
+
+    # Don't let any run of ice carry the die off the edge of the level.
+    for landing, slide in zip(graph.landings, graph.slides):
+        if landing < 0 and slide:
+            return None
+
+    # The relaxed distance is a lower bound, so it rules out a lot early.
+    solver = level.get_solver()
+    lower_bound = solver.get_heuristic()[0]
+    if lower_bound < 0 or lower_bound > options.max_par:
+        return None
+
+    solutions = solver.solve(engine='astar')
+    if not solutions:
+        return None
+
+    par = len(solutions[0])
+    if par < options.min_par or par > options.max_par:
+        return None
+
+    # Many optimal solutions make a level too easy to stumble through.
+    if solver.count_solutions() > options.max_solutions:
+        return None
+
+    level.par = par
+    return level
+
+
+def generate_batch(args):
+    """ Evaluates a batch of random candidates, returning the accepted ones
+    as (rows, par) tuples, along with the number of candidates tried. """
+
+    seed, count, options = args
+    rng = random.Random(seed)
+
+    accepted = []
+    for i in range(count):
+        rows = random_layout(rng, options)
+        if rows is None:
+            continue
+
+        level = evaluate_layout(rows, options)
+        if level is not None:
+            accepted.append((rows, level.par))
+
+    return accepted, count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m game.generate', description="Generates random puzzles.")
+    parser.add_argument('-o', '--output', required=True, help="directory to write the .lvl files to")
+    parser.add_argument('-n', '--count', type=int, default=10, help="number of puzzles to generate")
+    parser.add_argument('--prefix', default='generated', help="file name prefix for the puzzles")
+    parser.add_argument('--width', type=int, default=8)
+    parser.add_argument('--height', type=int, default=8)
+    parser.add_argument('--area', type=int, default=24, help="number of tiles to put down")
+    parser.add_argument('--min-par', type=int, default=12)
+    parser.add_argument('--max-par', type=int, default=40)
+    parser.add_argument('--max-solutions', type=int, default=2, help="reject puzzles with more optimal solutions")
+    parser.add_argument('--teleporter-chance', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--batch-size', type=int, default=200, help="candidates per work unit")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="number of worker processes (default: one per core)")
+    args = parser.parse_args(argv)
+
+    options = GeneratorOptions(
+        width=args.width,
+        height=args.height,
+        area=args.area,
+        min_par=args.min_par,
+        max_par=args.max_par,
+        max_solutions=args.max_solutions,
+        teleporter_chance=args.teleporter_chance,
+    )
+
+    os.makedirs(args.output, exist_ok=True)
+    seed_rng = random.Random(args.seed)
+
+    def batches():
+        while True:
+            yield seed_rng.getrandbits(64), args.batch_size, options
+
+    written = 0
+    tried = 0
+    seen = set()
+    start_time = time.perf_counter()
+
+    with Pool(args.jobs) as pool:
+        for accepted, count in pool.imap_unordered(generate_batch, batches()):
+            tried += count
+            for rows, par in accepted:
+                if written >= args.count:
+                    break
+
+                level = Level()
+                level.parse(rows)
+                level.par = par
+
+                # Don't write out the same puzzle twice.
+                key = level.get_hash()
+                if key in seen:
+                    continue
+                seen.add(key)
+
+                written += 1
+                fn = os.path.join(args.output, '{0}{1:04d}.lvl'.format(args.prefix, written))
+                level.write(fn)
+                print("{0}: par {1}".format(fn, par))
+
+            if written >= args.count:
+                pool.terminate()
+                break
+
+    elapsed = time.perf_counter() - start_time
+    print("Tried {0} candidates in {1:.1f} s ({2:.0f}/s), accepted {3}".format(
+        tried, elapsed, tried / elapsed, written), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+__all__ = ["HintSolver"]
+
+from .die import Die
+from .solver import ARROWS
+
+from queue import Queue, Empty
+import threading
+
+
+class HintSolver:
+    """ Solves the level from the current state of play on a worker thread,
+    so that the frame loop doesn't have to wait for it.  The result is posted
+    to a queue, which the caller should poll every frame. """
+
+    def __init__(self):
+        self.results = Queue()
+        self.cancel_event = None
+
+    def start(self, level, pos, die, toggle_state=False):
+        "Starts solving from the given state, cancelling any earlier request."
+
+        self.cancel()
+
+        # A compiled level may come with the solution from the very start.
+        if level.solution is not None and pos == level.entrance and die.orientation == 0 and \
+                not toggle_state and not level.crumbled:
+            self.cancel_event = threading.Event()
+            self.results.put((self.cancel_event, ['NESW'[ARROWS.index(arrow)] for arrow in level.solution]))
+            return
+
+        # Take a snapshot of the live state, since it changes under our feet.
+        die_copy = Die()
+        die_copy.orientation = die.orientation
+        crumbled = level.crumbled
+        cancel_event = threading.Event()
+        self.cancel_event = cancel_event
+
+        thread = threading.Thread(target=self._run, args=(level, pos, die_copy, toggle_state, crumbled, cancel_event), name="hint")
+        thread.daemon = True
+        thread.start()
+
+    def cancel(self):
+        "Abandons the pending request, if any.  Its result is never posted."
+
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+            self.cancel_event = None
+
+    @property
+    def pending(self):
+        return self.cancel_event is not None
+
+    def poll(self):
+        """ Returns the list of moves (as NESW letters) of the solution once it
+        has come in, an empty list if there is no solution, or None if there
+        is no result yet. """
+
+        while True:
+            try:
+                cancel_event, moves = self.results.get_nowait()
+            except Empty:
+                return None
+
+            # Skip stale results that were posted just before being cancelled.
+            if cancel_event is self.cancel_event:
+                self.cancel_event = None
+                return moves
+
+    def _run(self, level, pos, die, toggle_state, crumbled, cancel_event):
+        solutions = level.solve_from(pos, die, toggle_state, crumbled, cancel=cancel_event)
+        if cancel_event.is_set():
+            return
+
+        if solutions:
+            moves = ['NESW'[ARROWS.index(arrow)] for arrow in solutions[0]]
+        else:
+            moves = []
+        self.results.put((cancel_event, moves))
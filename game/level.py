@@ -1,9 +1,11 @@
-__all__ = ["Level", "TileType"]
+__all__ = ["Level", "LevelGraph", "Move", "TileType"]
 
 from .die import Die
 
+from array import array
+from collections import namedtuple
 from enum import Enum
-from copy import copy
+from hashlib import sha1
 
 
 class TileType(Enum):
@@ -26,126 +28,270 @@ class TileType(Enum):
 
     void = None
 
+    # These just look up the attributes filled in below the class.
+
     def is_passable(self, dieval, toggle_state=False):
-        if self.value is None:
-            return False
-        if self.value in '123456':
-            return int(self.value) == int(dieval)
-        elif self.value == '/':
-            return not toggle_state
-        elif self.value == '\\':
-            return toggle_state
-        else:
-            return True
+        "dieval is the bottom number of the die, or None for no die at all."
+
+        return (self.passable_bits >> (bool(toggle_state) * 8 + (dieval or 0))) & 1 == 1
 
     def get_symbol(self):
-        if self.value in '123456':
-            return chr(0x2680 + ord(self.value) - ord('1'))
-        else:
-            return ''
+        return self.symbol
 
     def get_color(self):
-        if self.value == 'e':
-            return (0.5, 1, 0.5, 1.0)
-        elif self.value == 't':
-            return (0.5, 0.3, 0.9, 1)
-        elif self.value == 's':
-            return (0.7, 0.95, 1.3, 0.7)
-        elif self.value == 'o':
-            return (1, 0.2, 0.2, 1.0)
-        else:
-            return (1, 1, 1, 1)
+        return self.color
 
     def get_model(self):
-        if self.value == 'x':
-            return "gfx/tile-cracked.bam"
-        elif self.value == 'o':
-            return "gfx/tile-button.bam"
-        else:
-            return "gfx/tile.bam"
+        return self.model
+
+
+def _get_tile_attributes(value):
+    """ Works out the attributes of the tile type with the given value, as a
+    (passable_bits, symbol, color, model) tuple.  Bit toggle_state * 8 +
+    bottom_number of passable_bits is set if the die may rest on the tile,
+    with a bottom number of 0 meaning no die. """
+
+    passable_bits = 0
+    for toggle_state in (False, True):
+        for number in range(7):
+            if value is None:
+                passable = False
+            elif value in '123456':
+                passable = int(value) == number
+            elif value == '/':
+                passable = not toggle_state
+            elif value == '\\':
+                passable = toggle_state
+            else:
+                passable = True
+
+            if passable:
+                passable_bits |= 1 << (toggle_state * 8 + number)
+
+    if value and value in '123456':
+        symbol = chr(0x2680 + ord(value) - ord('1'))
+    else:
+        symbol = ''
+
+    if value == 'e':
+        color = (0.5, 1, 0.5, 1.0)
+    elif value == 't':
+        color = (0.5, 0.3, 0.9, 1)
+    elif value == 's':
+        color = (0.7, 0.95, 1.3, 0.7)
+    elif value == 'o':
+        color = (1, 0.2, 0.2, 1.0)
+    else:
+        color = (1, 1, 1, 1)
+
+    if value == 'x':
+        model = "gfx/tile-cracked.bam"
+    elif value == 'o':
+        model = "gfx/tile-button.bam"
+    else:
+        model = "gfx/tile.bam"
+
+    return passable_bits, symbol, color, model
+
+
+def _fill_tile_attributes():
+    for code, type in enumerate(TileType):
+        type.code = code
+        type.passable_bits, type.symbol, type.color, type.model = _get_tile_attributes(type.value)
+
+
+_fill_tile_attributes()
+
+# Tile types by the code used for them in the level grid and LevelGraph.
+TILE_TYPES = tuple(TileType)
+TILE_CODES = {type: type.code for type in TILE_TYPES}
+VOID_CODE = TileType.void.code
+
+# Bits telling whether a die may rest on each type of tile, by code.  See
+# _get_tile_attributes for the layout.
+PASSABLE_BITS = tuple(type.passable_bits for type in TILE_TYPES)
+
+# For turning level text into codes and back again.
+CHAR_CODES = {type.value: code for code, type in enumerate(TILE_TYPES) if type.value}
+CODE_CHARS = bytes((ord(type.value or ' ') for type in TILE_TYPES)).ljust(256, b' ')
+
+# Offsets of the neighbouring tiles, in NESW order.
+DIRECTIONS = ((0, 1), (1, 0), (0, -1), (-1, 0))
+
+# How a move plays out, as returned by Level.get_move().
+Move = namedtuple('Move', ('target', 'slide', 'teleport'))
+
+
+class LevelGraph:
+    """ Compact form of the tiles of a level, used by the solvers.  Each tile
+    is numbered, starting with the entrance at 0, and everything about it is
+    stored in flat arrays indexed by that number:
+
+    offsets: where the tile is in the padded level grid.
+    types: the code of the tile type, an index into TILE_TYPES.
+    crack_bits: the bit given to the tile if it is cracked, 0 otherwise.
+    landings: for each of NESW, the tile the die ends up on when rolled that
+        way, after sliding over any ice and going through a teleporter, or -1
+        if it would fall off the level.
+    slides: for each of NESW, the number of ice tiles slid over on the way.
+    teleports: for each of NESW, 1 if the move ends in a teleporter.
+
+    The last three make up the move table, which the game and the solvers
+    both use, so that they always agree on where a move ends up.  Going the
+    other way, grid_cells holds the number of the tile at each offset in the
+    grid, or -1 if there is none, so the tiles right next to a tile are found
+    by adding the offsets in get_deltas().
+    """
+
+    def __init__(self, stride=2, grid_size=4):
+        self.stride = stride
+        self.grid_cells = array('i', [-1]) * grid_size
+        self.offsets = array('i')
+        self.types = bytearray()
+        self.crack_bits = []
+        self.landings = array('i')
+        self.slides = array('H')
+        self.teleports = bytearray()
+
+    def __len__(self):
+        return len(self.types)
+
+    def add_cell(self, offset, type, crack_bit=0):
+        "Adds a tile without any connections, returning its number."
+
+        i = len(self.types)
+        self.grid_cells[offset] = i
+        self.offsets.append(offset)
+        self.types.append(TILE_CODES[type])
+        self.crack_bits.append(crack_bit)
+        self.landings.extend((-1, -1, -1, -1))
+        self.slides.extend((0, 0, 0, 0))
+        self.teleports.extend(b'\0\0\0\0')
+        return i
+
+    def get_deltas(self):
+        "Returns the grid offsets of the neighbouring tiles, in NESW order."
+
+        stride = self.stride
+        return (stride, 1, -stride, -1)
+
+    def find(self, x, y):
+        "Returns the number of the tile at the given position, or -1."
+
+        stride = self.stride
+        if 0 <= x < stride - 2 and 0 <= y < len(self.grid_cells) // stride - 2:
+            return self.grid_cells[(y + 1) * stride + x + 1]
+        return -1
+
+    def get_position(self, i):
+        y, x = divmod(self.offsets[i], self.stride)
+        return (x - 1, y - 1)
+
+    def get_type(self, i):
+        return TILE_TYPES[self.types[i]]
 
 
 class Cell:
-    """ Abstract class for calculating solutions and level codes. """
-
-    def __init__(self, type):
-        self.type = type
-        self.neighbors = (None, None, None, None) # NESW
-
-    def solve(self, die):
-        solutions = []
-        self.r_solve(die, '', solutions, cracked=frozenset(), toggle_state=False, tested_states={})
-        return solutions
-
-    def r_solve(self, die, path, solutions, cracked, toggle_state, tested_states):
-        # Have we visited this cell before?
-        state = (self, die.top_number, die.east_number, die.north_number, toggle_state)
-        shortest_path = tested_states.get(state)
-        if shortest_path:
-            # We already went here in this state.
-            if len(shortest_path) < len(path):
-                # And last time we got here, we took a shorter path.
-                return
-
-        if solutions and len(path) > len(solutions[0]):
-            # Our current path is longer than a found solution, so forget it.
-            return
-
-        tested_states[state] = path
-
-        if self.type == TileType.cracked:
-            if self in cracked:
-                return
-            cracked = cracked | frozenset((self, ))
-
-        if not self.type.is_passable(die.bottom_number, toggle_state):
-            #print("%s: cannot move onto %s with number %d" % (path, self.type.name, die.bottom_number))
-            return
-
-        if self.type == TileType.exit:
-            if solutions:
-                if len(solutions[0]) > len(path):
-                    solutions.clear()
-            solutions.append(path)
-
-        if self.type == TileType.button:
-            toggle_state = not toggle_state
-
-        if self.neighbors[0]:
-            die_n = copy(die)
-            die_n.rotate_north()
-            self.neighbors[0].r_solve(die_n, path + '⇧', solutions=solutions, cracked=cracked, toggle_state=toggle_state, tested_states=tested_states)
-
-        if self.neighbors[1]:
-            die_e = copy(die)
-            die_e.rotate_east()
-            self.neighbors[1].r_solve(die_e, path + '⇨', solutions=solutions, cracked=cracked, toggle_state=toggle_state, tested_states=tested_states)
-
-        if self.neighbors[2]:
-            die_s = copy(die)
-            die_s.rotate_south()
-            self.neighbors[2].r_solve(die_s, path + '⇩', solutions=solutions, cracked=cracked, toggle_state=toggle_state, tested_states=tested_states)
-
-        if self.neighbors[3]:
-            die_w = copy(die)
-            die_w.rotate_west()
-            self.neighbors[3].r_solve(die_w, path + '⇦', solutions=solutions, cracked=cracked, toggle_state=toggle_state, tested_states=tested_states)
+    """ View of a single tile of a LevelGraph, for code that would rather
+    walk the graph one object at a time. """
+
+    __slots__ = ('graph', 'index')
+
+    def __init__(self, graph, index):
+        self.graph = graph
+        self.index = index
+
+    def __eq__(self, other):
+        return isinstance(other, Cell) and self.graph is other.graph and self.index == other.index
+
+    def __hash__(self):
+        return hash((id(self.graph), self.index))
+
+    @property
+    def pos(self):
+        return self.graph.get_position(self.index)
+
+    @property
+    def type(self):
+        return self.graph.get_type(self.index)
+
+    @property
+    def crack_bit(self):
+        return self.graph.crack_bits[self.index]
+
+    @property
+    def neighbors(self):
+        "Cells the die lands on when rolled in each of NESW, or None."
+
+        graph = self.graph
+        i = self.index * 4
+        return tuple(Cell(graph, n) if n >= 0 else None for n in graph.landings[i:i + 4])
+
+    def solve(self, die, toggle_state=False, engine='bfs'):
+        from .solver import Solver
+        return Solver(self.graph).solve(die, toggle_state, engine=engine, start=self.index)
 
 
 class Level:
+    """ The tiles are kept in a bytearray of tile codes, one byte per tile,
+    row by row.  There is a border of empty tiles all around, so that looking
+    at the neighbours of any tile never goes out of bounds. """
+
     def __init__(self):
-        self.rows = []
+        self.width = 0
+        self.height = 0
+        self.stride = 2
+        self.grid = bytearray(4)
         self.entrance = (0, 0)
         self.teleporters = []
         self.par = None
         self.key = None
-        self.begin_cell = None
-
-    def read(self, fn):
-        self.rows.clear()
+        self.solution = None
+        self.graph = None
+        self.solver = None
+
+        # Each cracked tile gets its own bit; the tiles that have crumbled
+        # away during play are tracked as a bitmask of those.
+        self.crack_bits = {}
+        self.crumbled = 0
+
+    def read(self, fn, build_graph=True):
+        self.parse(open(fn, 'r').readlines(), build_graph)
+
+    def copy(self):
+        """ Returns a fresh copy of this level for playing, with only the grid
+        copied.  The graph and the solver never change, so they are shared;
+        the parts that do change are reset to how they were at load time. """
+
+        level = Level()
+        level.width = self.width
+        level.height = self.height
+        level.stride = self.stride
+        level.grid = bytearray(self.grid)
+        level.entrance = self.entrance
+        level.teleporters = self.teleporters
+        level.par = self.par
+        level.key = self.key
+        level.solution = self.solution
+        level.graph = self.graph
+        level.solver = self.solver
+        level.crack_bits = self.crack_bits
+        return level
+
+    def parse(self, lines, build_graph=True):
+        """ Loads the level from the lines of a .lvl file.  The graph is built
+        as well, unless build_graph is false, in which case build_graph()
+        should be called afterwards.  Raises ValueError if the level has no
+        entrance. """
+
+        self.entrance = None
         self.teleporters.clear()
+        self.crack_bits.clear()
+        self.crumbled = 0
+        self.solution = None
 
-        for line in open(fn, 'r').readlines():
+        rows = []
+        for line in lines:
             line = line.rstrip()
 
             if line.startswith('#'):
@@ -154,58 +300,263 @@ class Level:
                 continue
 
             # Ignore empty lines at the beginning.
-            if not self.rows and not line.strip():
+            if not rows and not line.strip():
                 continue
 
+            codes = bytearray()
             for i, c in enumerate(line):
+                code = CHAR_CODES.get(c)
+                if code is None:
+                    code = VOID_CODE if c.isspace() else TILE_CODES[TileType(c)]
+                codes.append(code)
+
                 if c == 'b':
-                    self.entrance = i, len(self.rows)
+                    self.entrance = i, len(rows)
                 if c == 't':
-                    self.teleporters.append((i, len(self.rows)))
-            self.rows.append(line)
+                    self.teleporters.append((i, len(rows)))
+                if c == 'x':
+                    self.crack_bits[(i, len(rows))] = 1 << len(self.crack_bits)
+            rows.append(codes)
+
+        self.width = max((len(row) for row in rows), default=0)
+        self.height = len(rows)
+        self.stride = self.width + 2
+
+        padding = bytes((VOID_CODE, ))
+        self.grid = bytearray(padding * self.stride)
+        for row in rows:
+            self.grid += padding + row.ljust(self.width + 1, padding)
+        self.grid += padding * self.stride
+
+        self.graph = None
+        self.solver = None
+        if build_graph:
+            self.build_graph()
+
+    @property
+    def rows(self):
+        "The rows of the level as text, as they would be written out."
+
+        stride = self.stride
+        grid = self.grid
+        return [grid[i + 1:i + stride - 1].translate(CODE_CHARS).decode('ascii').rstrip()
+                for i in range(stride, stride * (self.height + 1), stride)]
+
+    @property
+    def begin_cell(self):
+        if self.graph:
+            return Cell(self.graph, 0)
+
+    @property
+    def cells(self):
+        "Maps the position of every tile in the graph to a Cell view."
+
+        graph = self.graph
+        if not graph:
+            return {}
+        return {graph.get_position(i): Cell(graph, i) for i in range(len(graph))}
+
+    def write(self, fn):
+        with open(fn, 'w') as fp:
+            if self.par is not None:
+                fp.write('# {0}\n'.format(self.par))
+            for row in self.rows:
+                fp.write(row.rstrip() + '\n')
+
+    def get_hash(self):
+        """ Returns a hash of the tile layout, ignoring trailing whitespace and
+        the par, which identifies the level to the solver cache. """
+
+        rows = [row.rstrip() for row in self.rows]
+        while rows and not rows[-1]:
+            rows.pop()
+        return sha1('\n'.join(rows).encode('utf-8')).hexdigest()
+
+    def get_solver(self):
+        "Returns the solver for this level, creating it on first use."
+
+        if self.solver is None:
+            from .solver import Solver
+            self.solver = Solver(self.graph)
+        return self.solver
+
+    def solve(self, engine='bfs'):
+        # Find best solutions.
+        return self.get_solver().solve(Die(), engine=engine)
 
-        # Build graph, starting from beginning.
-        self.cells = {}
-        self.begin_cell = self.__get_cell(self.cells, *self.entrance)
+    def solve_from(self, pos, die, toggle_state=False, crumbled=0, engine='astar', cancel=None):
+        """ Finds the best solution from a state in the middle of play.
+        crumbled is the bitmask of cracked tiles that are no longer there.
+        There is none if the die isn't on a tile. """
 
-    def solve(self):
-        # Find best solutions.
-        die = Die()
-        return self.begin_cell.solve(die)
+        start = self.graph.find(*pos)
+        if start < 0:
+            return []
+
+        solver = self.get_solver()
+        return solver.solve(die, toggle_state, engine=engine, start=start, cracked=crumbled, cancel=cancel)
+
+    def get_distances(self):
+        "Builds the table used by get_moves_left.  This may take a while."
 
-    def __get_cell(self, cells, x, y):
-        cell = cells.get((x, y))
-        if cell:
-            return cell
+        return self.get_solver().get_distances()
 
-        type = self.get_tile(x, y)
-        if type == TileType.void:
+    def get_moves_left(self, pos, die, toggle_state=False):
+        """ Looks up the number of moves left to the exit from the given state,
+        or returns None if the distance table hasn't been built yet.  Returns
+        UNREACHABLE if there is no way to get to the exit from there, which
+        includes the die not being on a tile, such as after sliding off the
+        edge. """
+
+        solver = self.solver
+        if solver is None or solver.distances is None:
             return None
 
-        cell = Cell(type)
-        cells[(x, y)] = cell
+        cell = self.graph.find(*pos)
+        if cell < 0:
+            from .solver import UNREACHABLE
+            return UNREACHABLE
+
+        return solver.distances[(cell * 24 + die.orientation) * 2 + int(toggle_state)]
+
+    def count_optimal_solutions(self):
+        return self.get_solver().count_solutions(Die())
+
+    def iter_solutions(self):
+        "Lazily generates all optimal solutions."
+
+        return self.get_solver().iter_solutions(Die())
+
+    def build_graph(self):
+        """ Builds the LevelGraph of every tile from the grid, in time and
+        memory linear in the number of tiles.  The entrance comes first, so
+        that it is 0.  Raises ValueError if there is no entrance tile. """
+
+        if self.entrance is None or self.get_tile(*self.entrance) != TileType.entrance:
+            raise ValueError("Level has no entrance")
 
-        # Neighbors: NESW
-        neighbors = []
-        for xo, yo in (0, 1), (1, 0), (0, -1), (-1, 0):
-            nx = x + xo
-            ny = y + yo
-            ncell = self.__get_cell(cells, nx, ny)
+        stride = self.stride
+        grid = self.grid
+        graph = LevelGraph(stride, len(grid))
+        grid_cells = graph.grid_cells
 
-            while ncell and ncell.type == TileType.ice:
-                nx += xo
-                ny += yo
-                ncell = self.__get_cell(cells, nx, ny)
+        entrance = (self.entrance[1] + 1) * stride + self.entrance[0] + 1
+        graph.add_cell(entrance, TileType.entrance, self.crack_bits.get(self.entrance, 0))
+
+        for offset, code in enumerate(grid):
+            if code != VOID_CODE and grid_cells[offset] < 0:
+                crack_bit = 0
+                if self.crack_bits:
+                    y, x = divmod(offset, stride)
+                    crack_bit = self.crack_bits.get((x - 1, y - 1), 0)
+                graph.add_cell(offset, TILE_TYPES[code], crack_bit)
+
+        offsets = graph.offsets
+        deltas = graph.get_deltas()
+
+        # Where a run of ice tiles ends and how long it is, for each ice tile
+        # and direction.  Each run is walked once, and all of its tiles are
+        # filled in at the end.
+        ice = TILE_CODES[TileType.ice]
+        types = graph.types
+        slide_ends = {}
+        for i, code in enumerate(types):
+            if code != ice:
+                continue
+
+            for dir, delta in enumerate(deltas):
+                if i * 4 + dir in slide_ends:
+                    continue
+
+                run = []
+                ni = i
+                while ni >= 0 and types[ni] == ice and ni * 4 + dir not in slide_ends:
+                    run.append(ni)
+                    ni = grid_cells[offsets[ni] + delta]
+
+                length = 0
+                if ni >= 0 and types[ni] == ice:
+                    ni, length = slide_ends[ni * 4 + dir]
+                for ri in reversed(run):
+                    length += 1
+                    slide_ends[ri * 4 + dir] = ni, length
+
+        # Teleporters are paired up in the order they appear.
+        teleports = {}
+        if len(self.teleporters) >= 2:
+            for t, pos in enumerate(self.teleporters):
+                npos = self.teleporters[(t + 1) % len(self.teleporters)]
+                teleports[graph.find(*pos)] = graph.find(*npos)
+
+        landings = graph.landings
+        key = 0
+        for offset in offsets:
+            for dir, delta in enumerate(deltas):
+                ni = grid_cells[offset + delta]
+                if ni >= 0 and types[ni] == ice:
+                    ni, graph.slides[key] = slide_ends[ni * 4 + dir]
+                if ni in teleports:
+                    graph.teleports[key] = 1
+                    ni = teleports[ni]
+                landings[key] = ni
+                key += 1
+
+        self.graph = graph
+        self.solver = None
+
+    def get_move(self, x, y, dir):
+        """ Looks up where rolling the die from the given tile in the given
+        direction (0-3 for NESW) ends up, as a Move tuple.  The target is the
+        position of the tile that the die comes to rest on, which may have
+        crumbled away in the meantime, or the empty spot it falls onto. """
+
+        graph = self.graph
+        cell = graph.find(x, y)
+        if cell < 0:
+            return self.__walk_move(x, y, dir)
+
+        key = cell * 4 + dir
+        landing = graph.landings[key]
+        slide = graph.slides[key]
+
+        if landing >= 0:
+            target = graph.get_position(landing)
+        else:
+            xo, yo = DIRECTIONS[dir]
+            target = (x + xo * (slide + 1), y + yo * (slide + 1))
 
-            if ncell and ncell.type == TileType.teleporter and len(self.teleporters) >= 2:
-                i = self.teleporters.index((nx, ny))
-                nx, ny = self.teleporters[(i + 1) % len(self.teleporters)]
-                ncell = self.__get_cell(cells, nx, ny)
+        return Move(target, slide, bool(graph.teleports[key]))
 
-            neighbors.append(ncell)
+    def __walk_move(self, x, y, dir):
+        """ Works out a move from a spot that isn't a tile, and therefore not in
+        the move table, by walking over the tiles the same way. """
 
-        cell.neighbors = tuple(neighbors)
-        return cell
+        graph = self.graph
+        types = graph.types
+        ice = TileType.ice.code
+        xo, yo = DIRECTIONS[dir]
+
+        x += xo
+        y += yo
+        slide = 0
+        landing = graph.find(x, y)
+        while landing >= 0 and types[landing] == ice:
+            x += xo
+            y += yo
+            slide += 1
+            landing = graph.find(x, y)
+
+        if landing >= 0 and types[landing] == TileType.teleporter.code and len(self.teleporters) >= 2:
+            t = self.teleporters.index((x, y))
+            return Move(self.teleporters[(t + 1) % len(self.teleporters)], slide, True)
+
+        return Move((x, y), slide, False)
+
+    def get_landing_tile(self, move):
+        """ Returns the type of the tile that the given move ends up on, which
+        is void if it has crumbled away or the die falls off the level. """
+
+        return self.get_tile(*move.target)
 
     def find_tile(self, type):
         "Returns the coordinates of the first tile with the given type."
@@ -215,39 +566,34 @@ class Level:
                 return (x, y)
 
     def get_tiles(self):
-        for y, row in enumerate(self.rows):
-            for x, tile in enumerate(row):
-                if not tile.isspace():
-                    model = TileType(tile)
-                    if model:
-                        yield (x, y, model)
+        stride = self.stride
+        grid = self.grid
+        for y in range(self.height):
+            i = (y + 1) * stride + 1
+            for x, code in enumerate(grid[i:i + self.width]):
+                if code != VOID_CODE:
+                    yield (x, y, TILE_TYPES[code])
 
     def get_tile(self, x, y):
-        if x < 0 or y < 0:
-            return TileType.void
-        try:
-            v = self.rows[y][x]
-        except IndexError:
-            return TileType.void
-
-        tile = self.rows[y][x]
-        if tile.isspace():
-            return TileType.void
-        return TileType(tile)
+        "Returns the type of the tile at the given position, or void if none."
+
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return TILE_TYPES[self.grid[(y + 1) * self.stride + x + 1]]
+        return TileType.void
 
     def remove_tile(self, x, y):
-        self.rows[y] = self.rows[y][:x] + ' ' + self.rows[y][x + 1:]
+        self.crumbled |= self.crack_bits.get((x, y), 0)
+        self.grid[(y + 1) * self.stride + x + 1] = VOID_CODE
 
-    def check_obstacle(self, x, y, dieval=None):
-        if x < 0 or y < 0:
-            return True
-        try:
-            v = self.rows[y][x]
-        except IndexError:
-            return True
+    def reset(self):
+        "Puts back the cracked tiles that have crumbled away."
 
-        if v.isspace():
-            return True
+        cracked = TileType.cracked.code
+        for x, y in self.crack_bits:
+            self.grid[(y + 1) * self.stride + x + 1] = cracked
+        self.crumbled = 0
 
-        tile = TileType(v)
-        return not tile.is_passable(dieval)
+    def check_obstacle(self, x, y, dieval=None):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return True
+        return not (PASSABLE_BITS[self.grid[(y + 1) * self.stride + x + 1]] >> (dieval or 0)) & 1
@@ -0,0 +1,248 @@
+""" Compiled level files, which load without parsing or building the graph.
+
+Usage: python -m game.lvlc [--solution] [-o OUTDIR] PATH...
+
+A .lvlc file holds the padded tile grid and the LevelGraph of a level in a
+fixed binary layout, along with its par and, optionally, an optimal solution.
+It is memory-mapped when loaded, and the graph arrays are used in place as
+views into the mapping, so loading takes time in the order of the number of
+tiles, with a small constant.  The compiler writes each .lvlc file next to
+its .lvl file, unless told otherwise.
+"""
+
+__all__ = ["compile_level", "write_compiled", "dump_compiled", "dump_level_file", "read_compiled", "load_compiled", "get_compiled_path", "main"]
+
+from .level import Level, LevelGraph, TileType
+from .validate import find_levels
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+
+
+MAGIC = b'LVLC'
+
+# Bump this whenever the layout changes; older files are then ignored.
+LVLC_VERSION = 2
+
+# Magic, version, flags, width, height, entrance x and y, par (-1 if none),
+# number of cells and size of the solution in bytes.  Then come the sections,
+# each padded to a multiple of four bytes: the padded tile grid and the
+# grid_cells array of the LevelGraph, both with an entry for each spot in the
+# grid, then its offsets, types, landings, slides and teleports arrays, with
+# one or four entries per cell, followed by the solution.
+HEADER = struct.Struct('<4sHHiiiiiII')
+
+# Sections of the graph, as (attribute, format, entries per cell).
+GRAPH_SECTIONS = (
+    ('offsets', 'i', 1),
+    ('types', 'B', 1),
+    ('landings', 'i', 4),
+    ('slides', 'H', 4),
+    ('teleports', 'B', 4),
+)
+
+
+def _pad(size):
+    return (size + 3) & ~3
+
+
+def _get_view(buffer, offset, count, format):
+    "Returns a view of count entries of the given format, and the new offset."
+
+    size = struct.calcsize(format) * count
+    view = buffer[offset:offset + size]
+    if format != 'B':
+        view = view.cast(format)
+        if sys.byteorder != 'little':
+            # The file is always little-endian, so this needs a copy.
+            from array import array
+            view = array(format, view)
+            view.byteswap()
+    return view, offset + _pad(size)
+
+
+def _find_tiles(level, type):
+    "Yields the (y, x) position of each tile of the given type, in order."
+
+    grid = level.grid
+    i = grid.find(type.code)
+    while i >= 0:
+        y, x = divmod(i, level.stride)
+        yield y - 1, x - 1
+        i = grid.find(type.code, i + 1)
+
+
+def get_compiled_path(fn):
+    return os.path.splitext(fn)[0] + '.lvlc'
+
+
+def _replace_file(fn, data):
+    """ Writes the data to a new file that then takes the place of the given
+    one.  Levels loaded from the old file keep it mapped into memory, so it
+    must never be overwritten in place. """
+
+    tmp_fn = fn + '.tmp'
+    try:
+        with open(tmp_fn, 'wb') as fp:
+            fp.write(data)
+        os.replace(tmp_fn, fn)
+    except BaseException:
+        try:
+            os.remove(tmp_fn)
+        except OSError:
+            pass
+        raise
+
+
+def write_compiled(level, fn, solution=None):
+    "Writes the given level to a .lvlc file."
+
+    _replace_file(fn, dump_compiled(level, solution))
+
+
+def dump_compiled(level, solution=None):
+    "Returns the contents of a .lvlc file for the given level, as bytes."
+
+    graph = level.graph
+    solution_data = (solution or '').encode('utf-8')
+    flags = 1 if solution is not None else 0
+    par = level.par if level.par is not None else -1
+
+    data = bytearray(HEADER.pack(MAGIC, LVLC_VERSION, flags, level.width, level.height,
+                                 level.entrance[0], level.entrance[1], par, len(graph), len(solution_data)))
+
+    grid_cells = graph.grid_cells
+    sections = [bytes(level.grid), struct.pack('<{0}i'.format(len(grid_cells)), *grid_cells)]
+    for attr, format, count in GRAPH_SECTIONS:
+        values = getattr(graph, attr)
+        sections.append(struct.pack('<{0}{1}'.format(len(values), format), *values))
+    sections.append(solution_data)
+
+    for section in sections:
+        data += section
+        data += b'\0' * (_pad(len(section)) - len(section))
+
+    return bytes(data)
+
+
+def read_compiled(fn):
+    """ Loads a level from a .lvlc file.  Raises ValueError if the file is
+    not a compiled level, or was written by a different version. """
+
+    with open(fn, 'rb') as fp:
+        try:
+            buffer = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Can't map an empty file.
+            raise ValueError("{0} is not a compiled level".format(fn))
+
+    return load_compiled(memoryview(buffer), fn)
+
+
+def load_compiled(buffer, fn='<buffer>'):
+    """ Loads a level from a memoryview holding the contents of a .lvlc file.
+    The graph arrays are views into it, which keep it alive. """
+
+    if len(buffer) < HEADER.size:
+        raise ValueError("{0} is not a compiled level".format(fn))
+
+    magic, version, flags, width, height, entrance_x, entrance_y, par, num_cells, solution_size = \
+        HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ValueError("{0} is not a compiled level".format(fn))
+    if version != LVLC_VERSION:
+        raise ValueError("{0} has unsupported version {1}".format(fn, version))
+
+    # Make sure that everything the header promises is actually there.
+    grid_size = (width + 2) * (height + 2)
+    size = HEADER.size + _pad(grid_size) + _pad(grid_size * 4) + solution_size
+    for attr, format, count in GRAPH_SECTIONS:
+        size += _pad(struct.calcsize(format) * num_cells * count)
+    if width < 0 or height < 0 or len(buffer) < size:
+        raise ValueError("{0} is truncated or corrupt".format(fn))
+
+    level = Level()
+    level.width = width
+    level.height = height
+    level.stride = width + 2
+    level.entrance = (entrance_x, entrance_y)
+    level.par = par if par >= 0 else None
+
+    offset = HEADER.size
+    grid, offset = _get_view(buffer, offset, level.stride * (height + 2), 'B')
+    level.grid = bytearray(grid)
+
+    # The cracked tiles and teleporters are numbered in reading order.
+    for y, x in _find_tiles(level, TileType.cracked):
+        level.crack_bits[(x, y)] = 1 << len(level.crack_bits)
+    level.teleporters = [(x, y) for y, x in _find_tiles(level, TileType.teleporter)]
+
+    graph = LevelGraph(level.stride)
+    graph.grid_cells, offset = _get_view(buffer, offset, len(level.grid), 'i')
+    for attr, format, count in GRAPH_SECTIONS:
+        view, offset = _get_view(buffer, offset, num_cells * count, format)
+        setattr(graph, attr, view)
+
+    graph.crack_bits = [0] * num_cells
+    for pos, bit in level.crack_bits.items():
+        graph.crack_bits[graph.find(*pos)] = bit
+    level.graph = graph
+
+    if flags & 1:
+        level.solution = bytes(buffer[offset:offset + solution_size]).decode('utf-8')
+
+    return level
+
+
+def dump_level_file(fn, solution=False):
+    """ Reads the given .lvl file and returns the contents of the .lvlc file
+    for it.  If solution is true, an optimal solution is worked out and
+    included. """
+
+    level = Level()
+    level.read(fn)
+
+    solved = None
+    if solution:
+        solutions = level.solve('astar')
+        if solutions:
+            solved = solutions[0]
+
+    return dump_compiled(level, solved)
+
+
+def compile_level(fn, output=None, solution=False):
+    "Compiles the given .lvl file, returning the path it was written to."
+
+    if output is None:
+        output = get_compiled_path(fn)
+
+    _replace_file(output, dump_level_file(fn, solution))
+    return output
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m game.lvlc', description="Compiles level files to .lvlc.")
+    parser.add_argument('paths', nargs='+', metavar='PATH', help="level file, or directory of .lvl files")
+    parser.add_argument('-o', '--output', default=None, help="directory to write to (default: next to each level)")
+    parser.add_argument('--solution', action='store_true', help="include an optimal solution")
+    args = parser.parse_args(argv)
+
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+
+    for fn in find_levels(args.paths):
+        output = None
+        if args.output:
+            output = os.path.join(args.output, os.path.basename(get_compiled_path(fn)))
+
+        print(compile_level(fn, output, args.solution))
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,51 @@
+__all__ = ["LevelPrefetcher"]
+
+import threading
+
+
+class LevelPrefetcher:
+    """ Loads a level on a worker thread ahead of time, so that it is ready by
+    the time it is needed.  Only the most recently requested level is kept.
+    The distance table is left to World.load_level, which builds it in the
+    background, since waiting for it here would hold up the level change. """
+
+    def __init__(self, library):
+        self.library = library
+
+        # Holds the name, the thread and a list to receive the level.
+        self.pending = None
+
+    def start(self, name):
+        "Starts loading the level with the given name, if it isn't already."
+
+        if self.pending is not None and self.pending[0] == name:
+            return
+
+        result = []
+        thread = threading.Thread(target=self._run, args=(name, result), name="prefetch")
+        thread.daemon = True
+        self.pending = (name, thread, result)
+        thread.start()
+
+    def take(self, name):
+        """ Returns the prefetched level with the given name, waiting for it
+        if it is still being loaded.  Returns None if a different level was
+        prefetched, or if it failed to load.  A level is only handed out once,
+        since the game changes it during play. """
+
+        pending = self.pending
+        if pending is None or pending[0] != name:
+            return None
+
+        self.pending = None
+        pending[1].join()
+        return pending[2][0] if pending[2] else None
+
+    def _run(self, name, result):
+        try:
+            level = self.library.load_level(name)
+        except (IOError, ValueError):
+            # Leave it to the regular load to report this.
+            return
+
+        result.append(level)
@@ -5,6 +5,8 @@ import esper
 import math
 
 from .level import TileType
+from .die import ROLLS, BOTTOM
+from .hint import HintSolver
 from . import components
 
 
@@ -27,7 +29,7 @@ class PlayerControl(esper.Processor, DirectObject):
         self.accept('mouse1', self.start_drag)
         self.accept('mouse1-up', self.stop_drag)
         self.accept('r', self.on_reload)
-        #self.accept('shift-h', self.move_auto)
+        self.accept('h', self.request_hint)
 
         self.locked = True
         self.moving = False
@@ -37,6 +39,7 @@ class PlayerControl(esper.Processor, DirectObject):
         self.cracked_tile = None
         self.button_tile = None
         self.reload = False
+        self.hint = HintSolver()
 
     def lock(self):
         # Locks the controls
@@ -55,6 +58,7 @@ class PlayerControl(esper.Processor, DirectObject):
         self.reload = True
 
     def clear_state(self):
+        self.hint.cancel()
         self.cracked_tile = None
         self.button_tile = None
         self.winning_move = False
@@ -91,33 +95,33 @@ class PlayerControl(esper.Processor, DirectObject):
         dir = int(round((-cam_spatial.path.get_h() / (360 / 4) - dir)) % 4)
         die.move('NESW'[dir])
 
-    def move_auto(self):
-        if self.locked or self.moving:
+    def request_hint(self):
+        if self.locked or self.moving or self.hint.pending:
             return
 
         die = self.world.component_for_entity(self.player, components.Die)
         spatial = self.world.component_for_entity(self.player, components.Spatial)
 
-        level = self.world.level
-        cell = level.cells[(spatial.x, spatial.y)]
-
-        solutions = cell.solve(die.die)
-        if solutions:
-            solution = solutions[0]
-            print("Executing solution %s" % (solution))
-            for arrow in solution:
-                if arrow == '⇧':
-                    die.move_up()
-                elif arrow == '⇨':
-                    die.move_right()
-                elif arrow == '⇩':
-                    die.move_down()
-                elif arrow == '⇦':
-                    die.move_left()
+        pos = (int(spatial.x), int(spatial.y))
+        self.hint.start(self.world.level, pos, die.die, self.world.toggle_state)
+
+    def on_hint(self, moves):
+        if self.locked:
+            return
+
+        die = self.world.component_for_entity(self.player, components.Die)
+
+        if moves:
+            print("Hint: the best solution from here is {0} moves, starting with {1}".format(len(moves), moves[0]))
+            die.move(moves[0])
         else:
             print("There is no solution!  Restart the level.")
+            self.world.die_icon.flash((1, 0, 0, 1))
 
     def start_move(self, dir):
+        # Whatever hint is being worked out, it's about to be out of date.
+        self.hint.cancel()
+
         die = self.world.component_for_entity(self.player, components.Die)
         spatial = self.world.component_for_entity(self.player, components.Spatial)
 
@@ -125,31 +129,34 @@ class PlayerControl(esper.Processor, DirectObject):
         orig_quat = spatial.path.get_quat()
         target_pos = spatial.path.get_pos()
         target_quat = spatial.path.get_quat()
-        next_number = None
+        next_orientation = ROLLS['NESW'.index(dir)][die.die.orientation]
+        next_number = BOTTOM[next_orientation]
         vector = core.Vec2(0, 0)
         if dir == 'N':
             vector.y += 1
             target_quat *= core.LRotation((1, 0, 0), -90)
-            next_number = die.die.north_number
         elif dir == 'E':
             vector.x += 1
             target_quat *= core.LRotation((0, 1, 0), 90)
-            next_number = die.die.east_number
         elif dir == 'S':
             vector.y -= 1
             target_quat *= core.LRotation((1, 0, 0), 90)
-            next_number = die.die.south_number
         elif dir == 'W':
             vector.x -= 1
             target_quat *= core.LRotation((0, 1, 0), -90)
-            next_number = die.die.west_number
 
         z_scale = math.sqrt(0.5) - 0.5
 
         target_pos.xy += vector
         x, y = int(target_pos[0]), int(target_pos[1])
         type = self.world.level.get_tile(x, y)
-        if not type.is_passable(next_number, self.world.toggle_state) and not base.mouseWatcherNode.is_button_down('pause'):
+
+        # The rest of the move is looked up in the level's move table.  The
+        # die has to be able to rest where it ends up, after any ice slide or
+        # teleport, just like the solver expects.
+        move = self.world.level.get_move(int(orig_pos[0]), int(orig_pos[1]), 'NESW'.index(dir))
+        landing_type = self.world.level.get_landing_tile(move)
+        if not landing_type.is_passable(next_number, self.world.toggle_state) and not base.mouseWatcherNode.is_button_down('pause'):
             self.moving = True
             Sequence(
                 Parallel(
@@ -163,7 +170,7 @@ class PlayerControl(esper.Processor, DirectObject):
                     spatial.path.quatInterval(0.05, orig_quat, blendType='easeIn'),
                 ),
                 Func(self.stop_move)).start()
-            if type.value and type.value in '123456':
+            if landing_type.value and landing_type.value in '123456':
                 self.world.die_icon.flash((1, 0, 0, 1))
                 if base.impassable_sound:
                     base.impassable_sound.play()
@@ -184,52 +191,50 @@ class PlayerControl(esper.Processor, DirectObject):
             if base.move_sound:
                 sequence.append(Func(base.move_sound.play))
 
-        while type == TileType.ice:
+        for i in range(move.slide):
             target_pos.xy += vector
-            x, y = int(target_pos[0]), int(target_pos[1])
-            type = self.world.level.get_tile(x, y)
 
-            if type == TileType.ice:
+            if i < move.slide - 1:
                 sequence.append(spatial.path.posInterval(0.25, target_pos))
             else:
                 sequence.append(spatial.path.posInterval(0.5, target_pos, blendType='easeOut'))
 
-        if type == TileType.teleporter:
-            # Find other teleporter.
+        if move.slide:
             x, y = int(target_pos[0]), int(target_pos[1])
-            others = set(self.world.teleporters)
-            others.discard((x, y))
-            if others:
-                new_xy = others.pop()
-                new_target_pos = core.Point3(target_pos)
-                new_target_pos.xy = new_xy
-                tile1 = self.world.tiles[(x, y)]
-                tile2 = self.world.tiles[new_xy]
-                tile1_path = self.world.component_for_entity(tile1, components.Spatial).path
-                tile2_path = self.world.component_for_entity(tile2, components.Spatial).path
-                tile1_path.set_pos(new_target_pos)
-                tile2_path.set_pos(target_pos)
-                elevation = (0, 0, 0.65)
-                time = max((target_pos.xy - new_target_pos.xy).length() * 0.15, 0.35)
-                if base.transport_sound:
-                    sequence.append(Func(base.transport_sound.play))
-                sequence.append(Parallel(
-                    Sequence(
-                        spatial.path.posInterval(0.25, target_pos + elevation, blendType='easeInOut'),
-                        spatial.path.posInterval(time, new_target_pos + elevation, blendType='easeInOut'),
-                        spatial.path.posInterval(0.25, new_target_pos, blendType='easeInOut'),
-                    ),
-                    Sequence(
-                        tile2_path.posInterval(0.25, target_pos + elevation, blendType='easeInOut'),
-                        tile2_path.posInterval(time, new_target_pos + elevation, blendType='easeInOut'),
-                        tile2_path.posInterval(0.25, new_target_pos, blendType='easeInOut'),
-                    ),
-                    Sequence(
-                        tile1_path.posInterval(0.25, new_target_pos - elevation, blendType='easeInOut'),
-                        tile1_path.posInterval(time, target_pos - elevation, blendType='easeInOut'),
-                        tile1_path.posInterval(0.25, target_pos, blendType='easeInOut'),
-                    ),
-                ))
+            type = self.world.level.get_tile(x, y)
+
+        if move.teleport:
+            # Swap places with the other teleporter.
+            new_xy = move.target
+            new_target_pos = core.Point3(target_pos)
+            new_target_pos.xy = new_xy
+            tile1 = self.world.tiles[(x, y)]
+            tile2 = self.world.tiles[new_xy]
+            tile1_path = self.world.component_for_entity(tile1, components.Spatial).path
+            tile2_path = self.world.component_for_entity(tile2, components.Spatial).path
+            tile1_path.set_pos(new_target_pos)
+            tile2_path.set_pos(target_pos)
+            elevation = (0, 0, 0.65)
+            time = max((target_pos.xy - new_target_pos.xy).length() * 0.15, 0.35)
+            if base.transport_sound:
+                sequence.append(Func(base.transport_sound.play))
+            sequence.append(Parallel(
+                Sequence(
+                    spatial.path.posInterval(0.25, target_pos + elevation, blendType='easeInOut'),
+                    spatial.path.posInterval(time, new_target_pos + elevation, blendType='easeInOut'),
+                    spatial.path.posInterval(0.25, new_target_pos, blendType='easeInOut'),
+                ),
+                Sequence(
+                    tile2_path.posInterval(0.25, target_pos + elevation, blendType='easeInOut'),
+                    tile2_path.posInterval(time, new_target_pos + elevation, blendType='easeInOut'),
+                    tile2_path.posInterval(0.25, new_target_pos, blendType='easeInOut'),
+                ),
+                Sequence(
+                    tile1_path.posInterval(0.25, new_target_pos - elevation, blendType='easeInOut'),
+                    tile1_path.posInterval(time, target_pos - elevation, blendType='easeInOut'),
+                    tile1_path.posInterval(0.25, target_pos, blendType='easeInOut'),
+                ),
+            ))
 
         if self.button_tile:
             # Make the button raised again
@@ -242,7 +247,7 @@ class PlayerControl(esper.Processor, DirectObject):
             # Break away the cracked tile
             if base.collapse_sound:
                 base.collapse_sound.play()
-            self.world.add_component(self.cracked_tile, components.Falling(drag=5.0))
+            self.world.add_component(self.cracked_tile, components.Falling(drag=5.0, keep=True))
             self.cracked_tile = None
 
         if type == TileType.exit:
@@ -250,9 +255,9 @@ class PlayerControl(esper.Processor, DirectObject):
             self.lock()
 
         if type == TileType.cracked:
-            self.cracked_tile = self.world.tiles[(x, y)]
+            self.cracked_tile = self.world.tiles.pop((x, y))
             self.world.level.remove_tile(x, y)
-            del self.world.tiles[(x, y)]
+            self.world.fallen_tiles[(x, y)] = self.cracked_tile
             sequence.append(Func(base.crack_sound.play))
 
         if type == TileType.button:
@@ -266,14 +271,7 @@ class PlayerControl(esper.Processor, DirectObject):
                 parallel.append(Func(base.button_sound.play))
             self.button_tile = button_tile
 
-        if dir == 'N':
-            die.die.rotate_north()
-        elif dir == 'E':
-            die.die.rotate_east()
-        elif dir == 'S':
-            die.die.rotate_south()
-        elif dir == 'W':
-            die.die.rotate_west()
+        die.die.orientation = next_orientation
 
         self.moving = True
 
@@ -291,6 +289,8 @@ class PlayerControl(esper.Processor, DirectObject):
             self.lock()
             self.winning_move = False
             self.world.win_level()
+        else:
+            self.world.update_moves_left()
 
         self.moving = False
 
@@ -308,6 +308,10 @@ class PlayerControl(esper.Processor, DirectObject):
             self.world.reload_level()
             return
 
+        moves = self.hint.poll()
+        if moves is not None:
+            self.on_hint(moves)
+
         if self.dragging_pos:
             ptr = base.win.get_pointer(0)
             if ptr.in_window:
@@ -340,7 +344,11 @@ class Gravity(esper.Processor):
             spatial.path.set_p(spatial.path.get_p() + dt)
 
             if spatial.path.get_z() < -35:
-                removed.append(ent)
+                removed.append((ent, spatial, fall))
 
-        for ent in removed:
-            self.world.delete_entity(ent)
+        for ent, spatial, fall in removed:
+            if fall.keep:
+                spatial.path.stash()
+                self.world.remove_component(ent, components.Falling)
+            else:
+                self.world.delete_entity(ent)
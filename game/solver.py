@@ -0,0 +1,653 @@
+__all__ = ["Solver", "ENGINES", "UNREACHABLE"]
+
+from .die import Die, ROLLS, BOTTOM
+from .level import TileType, TILE_CODES, PASSABLE_BITS
+
+from heapq import heappush, heappop
+from array import array
+from collections import Counter
+from itertools import accumulate
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Arrows used to spell out a solution, in NESW order.
+ARROWS = '⇧⇨⇩⇦'
+
+# Available search strategies for Solver.solve().  The vectorised one is
+# only there if NumPy is installed.
+ENGINES = ('bfs', 'astar', 'bidir')
+if numpy is not None:
+    ENGINES += ('numpy', )
+
+# Marks a dead end in the table returned by Solver.get_distances().
+UNREACHABLE = 0xffff
+
+# The vectorised search expands smaller frontiers than this one at a time.
+SPARSE_FRONTIER = 64
+
+# Undoing a roll is the same as rolling the other way.
+UNROLLS = tuple(ROLLS[(dir + 2) % 4] for dir in range(4))
+
+
+class Solver:
+    """ Finds the shortest way from a cell to an exit tile.  The state of the
+    game is packed into a single integer, holding (from the lowest bit up) the
+    cell index, the die orientation, the toggle state, and a bitmask of the
+    cracked tiles that have already been stepped on. """
+
+    def __init__(self, graph):
+        num_cells = len(graph)
+        self.num_cells = num_cells
+        self.cell_bits = max(num_cells - 1, 1).bit_length()
+
+        # Flattened NESW indices of the cell the die lands on, with -1
+        # meaning it falls off the level.
+        self.neighbors = graph.landings
+
+        # For each cell, a bitmask indexed by toggle_state * 8 + bottom_number
+        # telling whether the die may land on it.
+        self.passable = [PASSABLE_BITS[code] for code in graph.types]
+
+        button = TILE_CODES[TileType.button]
+        exit = TILE_CODES[TileType.exit]
+        self.buttons = bytearray(code == button for code in graph.types)
+        self.exits = bytearray(code == exit for code in graph.types)
+
+        # These were handed out when the level was loaded, so that the game
+        # can keep track of the crumbled tiles the same way.
+        self.crack_bits = graph.crack_bits
+        self.num_cracked = sum(1 for bit in self.crack_bits if bit)
+
+        # The moves leading onto each cell, as cell * 4 + direction, grouped
+        # by cell: the ones onto cell i are at entry_starts[i] up to
+        # entry_starts[i + 1] in entries.  The sort is stable, so they stay in
+        # order, and the moves off the level all end up in front.
+        landings = self.neighbors
+        counts = Counter(landings)
+        self.entry_starts = array('i', accumulate(map(counts.__getitem__, range(num_cells)), initial=0))
+        entries = sorted(range(len(landings)), key=landings.__getitem__)
+        self.entries = array('i', entries[counts[-1]:])
+
+        self.heuristic = None
+        self.distances = None
+        self.numpy_tables = None
+        self.expanded = 0
+
+    def pack(self, cell, orientation, toggle_state, cracked):
+        bits = self.cell_bits
+        return cell | (orientation << bits) | (toggle_state << (bits + 5)) | (cracked << (bits + 6))
+
+    def successors(self, state):
+        "Returns a (direction, state) tuple for every legal move from a state."
+
+        bits = self.cell_bits
+        cell = state & ((1 << bits) - 1)
+        orientation = (state >> bits) & 31
+        toggle_state = (state >> (bits + 5)) & 1
+        cracked = state >> (bits + 6)
+
+        neighbors = self.neighbors
+        passable = self.passable
+        crack_bits = self.crack_bits
+        buttons = self.buttons
+
+        result = []
+        for dir in range(4):
+            ncell = neighbors[cell * 4 + dir]
+            if ncell < 0:
+                continue
+
+            norientation = ROLLS[dir][orientation]
+            if not (passable[ncell] >> (toggle_state * 8 + BOTTOM[norientation])) & 1:
+                continue
+
+            bit = crack_bits[ncell]
+            if cracked & bit:
+                # This one has already crumbled away.
+                continue
+
+            ntoggle_state = toggle_state ^ buttons[ncell]
+            result.append((dir, ncell | (norientation << bits) | (ntoggle_state << (bits + 5)) | ((cracked | bit) << (bits + 6))))
+
+        return result
+
+    def predecessors(self, state):
+        """ Returns a (direction, state) tuple for every move that can lead
+        into a state.  These states live in the backward search space, in which
+        the bitmask holds the cracked tiles that are stepped on *after* leaving
+        the cell, rather than before. """
+
+        bits = self.cell_bits
+        cell = state & ((1 << bits) - 1)
+        orientation = (state >> bits) & 31
+        toggle_state = (state >> (bits + 5)) & 1
+        cracked = state >> (bits + 6)
+
+        # Undo the button press, and check we could have landed here at all.
+        toggle_state ^= self.buttons[cell]
+        if not (self.passable[cell] >> (toggle_state * 8 + BOTTOM[orientation])) & 1:
+            return []
+
+        crack_bits = self.crack_bits
+        cracked |= crack_bits[cell]
+
+        result = []
+        starts = self.entry_starts
+        for entry in self.entries[starts[cell]:starts[cell + 1]]:
+            pcell, dir = divmod(entry, 4)
+            if cracked & crack_bits[pcell]:
+                # We would be stepping on this one again later on.
+                continue
+
+            porientation = UNROLLS[dir][orientation]
+            result.append((dir, pcell | (porientation << bits) | (toggle_state << (bits + 5)) | (cracked << (bits + 6))))
+
+        return result
+
+    def solve(self, die=None, toggle_state=False, engine='bfs', start=0, cracked=0, cancel=None):
+        """ Returns a list containing an optimal solution as string of arrows,
+        or an empty list if the exit can't be reached.  The number of states
+        that were expanded is stored in the expanded attribute afterwards.
+
+        By default, the search starts on the first cell, but it can start on
+        any cell index, with a bitmask of the cracked tiles that are already
+        gone.  If cancel is given, it should be a threading.Event; once it is
+        set, the search is abandoned and an empty list is returned. """
+
+        if engine not in ENGINES:
+            raise ValueError("Unknown solver engine {0!r}".format(engine))
+        search = getattr(self, '_search_' + engine)
+
+        start = self._start(die, toggle_state, start, cracked)
+        if self.exits[start & ((1 << self.cell_bits) - 1)]:
+            return ['']
+
+        path = search(start, cancel)
+        if path is None:
+            return []
+
+        return [path]
+
+    def count_solutions(self, die=None, toggle_state=False):
+        """ Returns the number of distinct optimal solutions.  Rather than
+        spelling them out, this just adds up the number of ways to get to each
+        state, one layer of the shortest-path graph at a time. """
+
+        start = self._start(die, toggle_state)
+        if self.exits[0]:
+            return 1
+
+        cell_mask = (1 << self.cell_bits) - 1
+        successors = self.successors
+        exits = self.exits
+
+        visited = {start}
+        frontier = {start: 1}
+        while frontier:
+            next_frontier = {}
+            for state, count in frontier.items():
+                self.expanded += 1
+                for dir, nstate in successors(state):
+                    if nstate not in visited:
+                        next_frontier[nstate] = next_frontier.get(nstate, 0) + count
+
+            total = sum(count for state, count in next_frontier.items() if exits[state & cell_mask])
+            if total:
+                return total
+
+            visited.update(next_frontier)
+            frontier = next_frontier
+
+        return 0
+
+    def iter_solutions(self, die=None, toggle_state=False):
+        """ Generates every optimal solution as a string of arrows.  The search
+        runs when the first one is requested, but each solution is only
+        spelled out when it is asked for. """
+
+        start = self._start(die, toggle_state)
+        if self.exits[0]:
+            yield ''
+            return
+
+        cell_mask = (1 << self.cell_bits) - 1
+        successors = self.successors
+        exits = self.exits
+
+        # Holds every edge of the shortest-path graph leading into a state,
+        # encoded as the parent state times four plus the direction.
+        parents = {start: ()}
+        frontier = [start]
+        goals = []
+        while frontier and not goals:
+            layer = {}
+            for state in frontier:
+                self.expanded += 1
+                for dir, nstate in successors(state):
+                    if nstate in parents:
+                        continue
+
+                    edges = layer.get(nstate)
+                    if edges is None:
+                        layer[nstate] = [state * 4 + dir]
+                    else:
+                        edges.append(state * 4 + dir)
+
+            parents.update(layer)
+            goals = [state for state in layer if exits[state & cell_mask]]
+            frontier = list(layer)
+
+        # Walk back to the start from each exit state, depth-first.
+        for goal in goals:
+            stack = [(goal, '')]
+            while stack:
+                state, path = stack.pop()
+                edges = parents[state]
+                if not edges:
+                    yield path
+                for edge in reversed(edges):
+                    stack.append((edge >> 2, ARROWS[edge & 3] + path))
+
+    def _start(self, die, toggle_state, cell=0, cracked=0):
+        "Returns the initial state, and resets the expanded state count."
+
+        if die is None:
+            die = Die()
+
+        self.expanded = 0
+
+        # The tile we start on breaks away as soon as we leave it.
+        return self.pack(cell, die.orientation, int(toggle_state), cracked | self.crack_bits[cell])
+
+    def _search_bfs(self, start, cancel):
+        "Level-order search; the first exit that turns up is an optimal one."
+
+        # Maps each visited state to the state it was reached from, times four,
+        # plus the direction that was taken.
+        parents = {start: -1}
+
+        cell_mask = (1 << self.cell_bits) - 1
+        successors = self.successors
+        exits = self.exits
+
+        frontier = [start]
+        while frontier:
+            next_frontier = []
+            for state in frontier:
+                if cancel is not None and cancel.is_set():
+                    return None
+
+                self.expanded += 1
+                for dir, nstate in successors(state):
+                    if nstate in parents:
+                        continue
+
+                    parents[nstate] = state * 4 + dir
+                    if exits[nstate & cell_mask]:
+                        return self._trace(parents, nstate)
+
+                    next_frontier.append(nstate)
+
+            frontier = next_frontier
+
+    def _search_astar(self, start, cancel):
+        """ Best-first search guided by the distance to the exit in a relaxed
+        version of the level.  That heuristic is consistent, so the first time
+        a state is taken off the queue, it has been reached optimally. """
+
+        bits = self.cell_bits
+        cell_mask = (1 << bits) - 1
+        successors = self.successors
+        exits = self.exits
+        heuristic = self.get_heuristic()
+
+        h = heuristic[(start & cell_mask) * 24 + ((start >> bits) & 31)]
+        if h < 0:
+            return None
+
+        # Ties are broken in favour of the deepest state.
+        parents = {start: -1}
+        costs = {start: 0}
+        queue = [(h, 0, start)]
+        while queue:
+            f, g, state = heappop(queue)
+            g = -g
+            if g > costs[state]:
+                continue
+
+            if exits[state & cell_mask]:
+                return self._trace(parents, state)
+
+            if cancel is not None and cancel.is_set():
+                return None
+
+            self.expanded += 1
+            g += 1
+            for dir, nstate in successors(state):
+                if costs.get(nstate, g + 1) <= g:
+                    continue
+
+                h = heuristic[(nstate & cell_mask) * 24 + ((nstate >> bits) & 31)]
+                if h < 0:
+                    continue
+
+                costs[nstate] = g
+                parents[nstate] = state * 4 + dir
+                heappush(queue, (g + h, -g, nstate))
+
+    def _search_bidir(self, start, cancel):
+        """ Searches forward from the start and backward from every exit at
+        the same time, one full layer at a time, always growing the smaller
+        frontier.  A forward and a backward state meet when they agree on the
+        cell, orientation and toggle state and don't share any cracked tiles.
+        The first meeting is an optimal one, since any shorter path would have
+        met in an earlier layer. """
+
+        bits = self.cell_bits
+        shift = bits + 6
+        key_mask = (1 << shift) - 1
+        successors = self.successors
+        predecessors = self.predecessors
+
+        # The visited states on both sides, grouped by everything except the
+        # cracked tiles, so meetings can be looked up quickly.
+        parents = {start: -1}
+        forward_keys = {start & key_mask: [start]}
+        frontier = [start]
+
+        children = {}
+        backward_keys = {}
+        backward_frontier = []
+        for cell, exit in enumerate(self.exits):
+            if exit:
+                for orientation in range(24):
+                    for toggle_state in (0, 1):
+                        state = self.pack(cell, orientation, toggle_state, 0)
+                        children[state] = -1
+                        backward_keys[state & key_mask] = [state]
+                        backward_frontier.append(state)
+
+        while frontier and backward_frontier:
+            if len(frontier) <= len(backward_frontier):
+                next_frontier = []
+                for state in frontier:
+                    if cancel is not None and cancel.is_set():
+                        return None
+
+                    self.expanded += 1
+                    for dir, nstate in successors(state):
+                        if nstate in parents:
+                            continue
+
+                        parents[nstate] = state * 4 + dir
+                        key = nstate & key_mask
+                        cracked = nstate >> shift
+                        for bstate in backward_keys.get(key, ()):
+                            if not (bstate >> shift) & cracked:
+                                return self._trace(parents, nstate) + self._trace_back(children, bstate)
+
+                        forward_keys.setdefault(key, []).append(nstate)
+                        next_frontier.append(nstate)
+
+                frontier = next_frontier
+            else:
+                next_frontier = []
+                for state in backward_frontier:
+                    if cancel is not None and cancel.is_set():
+                        return None
+
+                    self.expanded += 1
+                    for dir, pstate in predecessors(state):
+                        if pstate in children:
+                            continue
+
+                        children[pstate] = state * 4 + dir
+                        key = pstate & key_mask
+                        cracked = pstate >> shift
+                        for fstate in forward_keys.get(key, ()):
+                            if not (fstate >> shift) & cracked:
+                                return self._trace(parents, fstate) + self._trace_back(children, pstate)
+
+                        backward_keys.setdefault(key, []).append(pstate)
+                        next_frontier.append(pstate)
+
+                backward_frontier = next_frontier
+
+    def _search_numpy(self, start, cancel):
+        """ Expands the whole frontier at once, using array operations.  The
+        frontier is an array of the states in it, each numbered (cell * 24 +
+        orientation) * 2 + toggle_state, so a layer takes time in the order of
+        its own size, not that of the level.  The set of crumbled tiles can't
+        be numbered like that, so for levels that have cracked tiles, this
+        uses the scalar search instead. """
+
+        if self.num_cracked:
+            return self._search_bfs(start, cancel)
+
+        landings, rolls, bottoms, passable, buttons, exits = self._get_numpy_tables()
+
+        bits = self.cell_bits
+        cell = start & ((1 << bits) - 1)
+        orientation = (start >> bits) & 31
+        toggle_state = (start >> (bits + 5)) & 1
+
+        # The number of moves to each state, or -1 if it hasn't been reached.
+        distances = numpy.full(self.num_cells * 48, -1, dtype=numpy.int32)
+        frontier = numpy.array([(cell * 24 + orientation) * 2 + toggle_state], dtype=numpy.intp)
+        distances[frontier] = 0
+
+        depth = 0
+        while len(frontier):
+            if cancel is not None and cancel.is_set():
+                return None
+
+            self.expanded += len(frontier)
+            depth += 1
+
+            if len(frontier) < SPARSE_FRONTIER:
+                # Not worth the overhead of the array operations.
+                arrived = numpy.array(self._expand_numbered(frontier.tolist()), dtype=numpy.intp)
+            else:
+                cells, rest = numpy.divmod(frontier, 48)
+                orientations, toggle_states = numpy.divmod(rest, 2)
+                cells *= 4
+
+                # Roll the die each way.  A missing landing is -1, which picks
+                # out the extra, impassable cell at the end of the tables.
+                arrived = []
+                for dir in range(4):
+                    ncells = landings[cells + dir]
+                    norientations = rolls[dir][orientations]
+                    allowed = (passable[ncells] >> (toggle_states * 8 + bottoms[norientations])) & 1 == 1
+                    ncells = ncells[allowed]
+                    arrived.append((ncells * 24 + norientations[allowed]) * 2 + (toggle_states[allowed] ^ buttons[ncells]))
+
+                arrived = numpy.concatenate(arrived)
+
+            arrived = numpy.unique(arrived[distances[arrived] < 0])
+            distances[arrived] = depth
+
+            goals = arrived[exits[arrived // 48]]
+            if len(goals):
+                cell, rest = divmod(int(goals[0]), 48)
+                orientation, toggle_state = divmod(rest, 2)
+                return self._trace_distances(distances, cell, orientation, toggle_state, depth)
+
+            frontier = arrived
+
+    def _expand_numbered(self, states):
+        """ Returns the states one move away from the given ones, numbered the
+        way the vectorised search does, one at a time. """
+
+        neighbors = self.neighbors
+        passable = self.passable
+        buttons = self.buttons
+
+        result = []
+        for state in states:
+            cell, rest = divmod(state, 48)
+            orientation, toggle_state = divmod(rest, 2)
+            for dir in range(4):
+                ncell = neighbors[cell * 4 + dir]
+                if ncell < 0:
+                    continue
+
+                norientation = ROLLS[dir][orientation]
+                if (passable[ncell] >> (toggle_state * 8 + BOTTOM[norientation])) & 1:
+                    result.append((ncell * 24 + norientation) * 2 + (toggle_state ^ buttons[ncell]))
+
+        return result
+
+    def _get_numpy_tables(self):
+        "Builds the arrays used by the vectorised search."
+
+        if self.numpy_tables is None:
+            # Each table gets one extra cell at the end, which can't be
+            # landed on, so that it can be indexed with -1.
+            self.numpy_tables = (
+                numpy.asarray(self.neighbors, dtype=numpy.intp),
+                numpy.array(ROLLS, dtype=numpy.intp),
+                numpy.array(BOTTOM, dtype=numpy.intp),
+                numpy.array(self.passable + [0], dtype=numpy.intp),
+                numpy.frombuffer(self.buttons + b'\0', dtype=numpy.uint8).astype(numpy.intp),
+                numpy.frombuffer(self.exits + b'\0', dtype=bool),
+            )
+
+        return self.numpy_tables
+
+    def _trace_distances(self, distances, cell, orientation, toggle_state, depth):
+        """ Walks back from the given state to the start along states whose
+        distance goes down by one each move, building up the path. """
+
+        starts = self.entry_starts
+        path = []
+        while depth > 0:
+            toggle_state ^= self.buttons[cell]
+            for entry in self.entries[starts[cell]:starts[cell + 1]]:
+                pcell, dir = divmod(entry, 4)
+                porientation = UNROLLS[dir][orientation]
+                if distances[(pcell * 24 + porientation) * 2 + toggle_state] == depth - 1:
+                    break
+
+            path.append(ARROWS[dir])
+            cell = pcell
+            orientation = porientation
+            depth -= 1
+
+        return ''.join(reversed(path))
+
+    def get_distances(self):
+        """ Returns an array('H') holding the number of moves left to the exit
+        from every (cell, orientation, toggle state) triple, indexed by
+        (cell * 24 + orientation) * 2 + toggle_state, with UNREACHABLE marking
+        the dead ends.  Cracked tiles are assumed to still be there, so if the
+        level has any, the distances are only a lower bound; a dead end is
+        still always a dead end, though. """
+
+        if self.distances is not None:
+            return self.distances
+
+        passable = self.passable
+        buttons = self.buttons
+        starts = self.entry_starts
+        entries = self.entries
+
+        distances = array('H', [UNREACHABLE]) * (self.num_cells * 48)
+        frontier = []
+        for cell, exit in enumerate(self.exits):
+            if exit:
+                for key in range(cell * 48, cell * 48 + 48):
+                    distances[key] = 0
+                    frontier.append(key)
+
+        # Work backwards from the exits, undoing each roll and button press.
+        distance = 0
+        while frontier:
+            distance += 1
+            next_frontier = []
+            for key in frontier:
+                ncell, rest = divmod(key, 48)
+                norientation, toggle_state = divmod(rest, 2)
+                toggle_state ^= buttons[ncell]
+                if not (passable[ncell] >> (toggle_state * 8 + BOTTOM[norientation])) & 1:
+                    continue
+
+                for entry in entries[starts[ncell]:starts[ncell + 1]]:
+                    pkey = ((entry >> 2) * 24 + UNROLLS[entry & 3][norientation]) * 2 + toggle_state
+                    if distances[pkey] == UNREACHABLE:
+                        distances[pkey] = distance
+                        next_frontier.append(pkey)
+
+            frontier = next_frontier
+
+        self.distances = distances
+        return distances
+
+    def get_heuristic(self):
+        """ Returns a lower bound on the number of moves to the exit for every
+        (cell, orientation) pair, indexed by cell * 24 + orientation, or -1 if
+        there is no way to get to the exit from there.  It is the exact
+        distance in a relaxed version of the level, in which toggled tiles are
+        always up and cracked tiles never crumble.  Like in the real level, an
+        ice slide or teleport is part of the move that leads onto it. """
+
+        if self.heuristic is not None:
+            return self.heuristic
+
+        num_cells = self.num_cells
+        relaxed = bytearray((mask | (mask >> 8)) & 0xff for mask in self.passable)
+        starts = self.entry_starts
+        entries = self.entries
+
+        heuristic = [-1] * (num_cells * 24)
+        frontier = []
+        for cell in range(num_cells):
+            if self.exits[cell]:
+                for orientation in range(24):
+                    heuristic[cell * 24 + orientation] = 0
+                    frontier.append(cell * 24 + orientation)
+
+        # Work backwards from the exits, undoing each roll.
+        distance = 0
+        while frontier:
+            distance += 1
+            next_frontier = []
+            for key in frontier:
+                ncell, norientation = divmod(key, 24)
+                if not (relaxed[ncell] >> BOTTOM[norientation]) & 1:
+                    continue
+
+                for entry in entries[starts[ncell]:starts[ncell + 1]]:
+                    pkey = (entry >> 2) * 24 + UNROLLS[entry & 3][norientation]
+                    if heuristic[pkey] < 0:
+                        heuristic[pkey] = distance
+                        next_frontier.append(pkey)
+
+            frontier = next_frontier
+
+        self.heuristic = heuristic
+        return heuristic
+
+    def _trace(self, parents, state):
+        "Follows the parent pointers back to the start to build the path."
+
+        path = []
+        parent = parents[state]
+        while parent >= 0:
+            path.append(ARROWS[parent & 3])
+            parent = parents[parent >> 2]
+        return ''.join(reversed(path))
+
+    def _trace_back(self, children, state):
+        "Follows the child pointers of the backward search to the exit."
+
+        path = []
+        child = children[state]
+        while child >= 0:
+            path.append(ARROWS[child & 3])
+            child = children[child >> 2]
+        return ''.join(path)
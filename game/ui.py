@@ -261,6 +261,7 @@ class Indicator:
     def clear_icon(self):
         old_icon = self.icon
         if old_icon:
+            self.icon = None
             Sequence(
                 old_icon.colorScaleInterval(1.0, (1, 1, 1, 0)),
                 Func(old_icon.destroy),
@@ -0,0 +1,133 @@
+""" Checks that the par declared in level files matches the solver.
+
+Usage: python -m game.validate [-j JOBS] [--engine ENGINE] [--cache] PATH...
+
+Levels are solved in a pool of worker processes.  A JSON object is written
+to stdout for each level as soon as it is done, and the exit status is
+non-zero if any level has a wrong par or could not be loaded or solved.
+"""
+
+__all__ = ["validate_level", "main"]
+
+from .level import Level
+from .solver import ENGINES
+from .cache import SolverCache, compute_result
+
+from multiprocessing import Pool
+from glob import glob
+import argparse
+import json
+import os
+import sys
+import time
+
+
+# Cache entries handed to each worker process, if the cache is in use.
+_cache_entries = None
+
+
+def _init_worker(cache_entries):
+    global _cache_entries
+    _cache_entries = cache_entries
+
+
+def validate_level(fn, engine='bfs'):
+    """ Reads and solves a single level file, and returns a dict describing
+    the outcome.  If a cache was passed to the worker, a dict of the new entry
+    is included under the 'cache' key for the parent process to store. """
+
+    result = {
+        'level': os.path.splitext(os.path.basename(fn))[0],
+        'file': fn,
+    }
+
+    start_time = time.perf_counter()
+    try:
+        level = Level()
+        level.read(fn)
+        result['par'] = level.par
+        read_time = time.perf_counter()
+
+        if _cache_entries is not None:
+            key = level.get_hash()
+            entry = _cache_entries.get(key)
+            if entry is None:
+                entry = list(compute_result(level))
+                result['cache'] = [key, entry]
+            computed, states = entry[0], entry[3]
+        else:
+            solutions = level.solve(engine)
+            computed = len(solutions[0]) if solutions else None
+            states = level.solver.expanded
+
+    except Exception as ex:
+        result['error'] = "{0}: {1}".format(type(ex).__name__, ex)
+        result['ok'] = False
+        return result
+
+    end_time = time.perf_counter()
+    result['computed'] = computed
+    result['ok'] = computed is not None and computed == level.par
+    result['read_time'] = round(read_time - start_time, 6)
+    result['solve_time'] = round(end_time - read_time, 6)
+    result['states'] = states
+    return result
+
+
+def _validate_args(args):
+    return validate_level(*args)
+
+
+def find_levels(paths):
+    "Expands the given directories into a sorted list of level files."
+
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(glob(os.path.join(path, '*.lvl')))
+        else:
+            files.append(path)
+    return files
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m game.validate', description="Validates the par of level files.")
+    parser.add_argument('paths', nargs='+', metavar='PATH', help="level file, or directory of .lvl files")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="number of worker processes (default: one per core)")
+    parser.add_argument('--engine', choices=ENGINES, default='bfs', help="solver engine to use")
+    parser.add_argument('--cache', action='store_true', help="reuse results from the persistent solver cache")
+    args = parser.parse_args(argv)
+
+    files = find_levels(args.paths)
+
+    cache = None
+    cache_entries = None
+    if args.cache:
+        cache = SolverCache()
+        cache_entries = cache.entries
+
+    failed = 0
+    with Pool(args.jobs, initializer=_init_worker, initargs=(cache_entries, )) as pool:
+        for result in pool.imap_unordered(_validate_args, [(fn, args.engine) for fn in files]):
+            entry = result.pop('cache', None)
+            if entry is not None:
+                cache.put(*entry)
+
+            if not result['ok']:
+                failed += 1
+
+            sys.stdout.write(json.dumps(result) + '\n')
+            sys.stdout.flush()
+
+    if cache is not None:
+        cache.save()
+
+    if failed:
+        print("{0} of {1} levels failed validation".format(failed, len(files)), file=sys.stderr)
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,14 +4,22 @@ import esper
 from . import components
 from . import processors
 from . import ui
-from .level import Level, TileType
+from .level import TileType
+from .bundle import LevelLibrary
+from .prefetch import LevelPrefetcher
+from .solver import UNREACHABLE
 
 from direct.interval.IntervalGlobal import LerpFunctionInterval, Func, Sequence, Parallel
 
 import os
+import threading
 from random import random, randint
 
 
+# Every model that a tile can have.
+TILE_MODELS = sorted(set(type.model for type in TileType if type != TileType.void))
+
+
 class World(esper.World):
     def __init__(self):
         super().__init__(self)
@@ -25,9 +33,29 @@ class World(esper.World):
         self.root.set_fog(fog)
 
         self.level = None
+        self.levels = LevelLibrary([
+            os.path.join(os.path.dirname(__file__), 'levels'),
+            os.path.join(os.path.dirname(__file__), '..', 'levels'),
+            os.path.join(base.mainDir, 'levels'),
+        ])
+        self.prefetcher = LevelPrefetcher(self.levels)
+        self.warm_models = None
 
         self.tiles = {}
+        self.fallen_tiles = {}
+
+        # Tile entities that aren't in use, by tile type, for place_tile to
+        # reuse, along with the type of every tile entity.  The pool for each
+        # type holds at most max_pooled_tiles; any more are deleted.
+        self.tile_pool = {}
+        self.tile_types = {}
+        self.max_pooled_tiles = core.ConfigVariableInt('tile-pool-size', 64).value
         self.old_tiles = []
+
+        # The transforms of the tiles at the start of the level, if the level
+        # can be reset in place to how it was then.
+        self.tile_states = None
+        self.toggle_interval = None
         self.next_levels = []
 
         # Add player
@@ -51,7 +79,6 @@ class World(esper.World):
         sun = self.create_entity()
         self.add_component(sun, components.Sun((0.7, 0.4, -0.7), color_temperature=6000, intensity=2.05))
 
-        self.teleporters = set()
         self.toggle_tiles = set()
         self.toggle_state = False
 
@@ -66,6 +93,7 @@ class World(esper.World):
         ui.Button(self.hud, "      reset", (0.2, -0.13), icon="", command=self.player_control.on_reload, anchor='top-left')
 
         self.move_counter = ui.Indicator(self.hud, 0, (-0.17, -0.13), anchor='top-right')
+        self.moves_left = ui.Indicator(self.hud, '', (-0.17, -0.25), anchor='top-right')
 
         #self.die_icon = ui.Icon(self.hud, '', (0.0, -0.15), anchor='top-center')
         self.die_icon = ui.Icon(self.hud, '', (-0.15, 0.1), anchor='bottom-right')
@@ -112,6 +140,26 @@ class World(esper.World):
 
         self.die_icon.set(' '[die.die.bottom_number])
 
+    def update_moves_left(self):
+        "Shows how many moves are left, or whether the level is a lost cause."
+
+        spatial = self.component_for_entity(self.player, components.Spatial)
+        die = self.component_for_entity(self.player, components.Die)
+
+        pos = (int(spatial.x), int(spatial.y))
+        moves_left = self.level.get_moves_left(pos, die.die, self.toggle_state)
+        if moves_left == UNREACHABLE:
+            print("There is no solution from here!  Restart the level.")
+            self.moves_left.set_value('')
+            self.moves_left.set_icon('\uf00d')
+        elif moves_left is not None and self.level.solver.num_cracked == 0:
+            # The count can't be trusted on levels with cracked tiles.
+            self.moves_left.set_value(moves_left)
+            self.moves_left.clear_icon()
+        else:
+            self.moves_left.set_value('')
+            self.moves_left.clear_icon()
+
     def on_level_start(self):
         if not base.blurred:
             self.player_control.unlock()
@@ -122,6 +170,12 @@ class World(esper.World):
         die.die.reset()
         self.toggle_state = False
 
+        if self.tile_states is None:
+            self.tile_states = []
+            for tile in list(self.tiles.values()) + list(self.fallen_tiles.values()):
+                path = self.component_for_entity(tile, components.Spatial).path
+                self.tile_states.append((path, path.get_transform()))
+
         # Delete old tiles
         max_old_tiles = 2
         if base.quality < 2:
@@ -130,13 +184,36 @@ class World(esper.World):
         while len(self.old_tiles) > max_old_tiles:
             oldest_tiles = self.old_tiles.pop(0)
             for tile in oldest_tiles:
-                self.delete_entity(tile)
+                self.release_tile(tile)
 
         if self.level.par is not None:
             self.move_counter.set_icon('', style='solid')
         else:
             self.move_counter.clear_icon()
         self.move_counter.set_value(0)
+        self.moves_left.set_value('')
+        self.moves_left.clear_icon()
+
+        self.prefetch_next_level()
+
+    def prefetch_next_level(self):
+        "Gets the next level ready in the background while this one is played."
+
+        if not self.next_levels or not self.next_levels[0]:
+            return
+
+        self.prefetcher.start(self.next_levels[0])
+
+        # Get every tile model into the model pool, without holding up the
+        # frame, so that placing the tiles of the next level doesn't have to
+        # wait for the disk.
+        if self.warm_models is None:
+            self.warm_models = []
+            loader.load_model(TILE_MODELS, callback=self.on_models_warmed)
+
+    def on_models_warmed(self, models):
+        # Hang on to them, so that they stay in the model pool.
+        self.warm_models = models
 
     def toggle_button(self):
         self.toggle_state = not self.toggle_state
@@ -160,7 +237,8 @@ class World(esper.World):
                 parallel.append(spatial.path.hprInterval(0.75, (0, 90, 0), blendType='easeInOut'))
                 parallel.append(spatial.path.posInterval(0.75, pos, blendType='easeInOut'))
 
-        return Parallel(*parallel).start()
+        self.toggle_interval = Parallel(*parallel)
+        self.toggle_interval.start()
 
     def win_level(self):
         if base.endtile_sound:
@@ -196,35 +274,67 @@ class World(esper.World):
         self.load_level(level)
 
     def reload_level(self):
-        if self.player_control.locked:
-            pass
-
         if base.restart_sound:
             base.restart_sound.play()
-        self.load_level(self.level_name)
 
-    def load_level(self, name):
+        if self.tile_states is not None and not self.player_control.moving:
+            self.reset_level()
+        else:
+            self.load_level(self.level_name)
+
+    def reset_level(self):
+        """ Puts the current level back the way it was when it started, by
+        restoring the tiles in place rather than building it again. """
+
         self.hud.hide()
         self.player_control.lock()
         self.player_control.clear_state()
 
-        level_file = os.path.join(os.path.dirname(__file__), 'levels', name + '.lvl')
-        if not os.path.isfile(level_file):
-            level_file = os.path.join(os.path.dirname(__file__), '..', 'levels', name + '.lvl')
-        if not os.path.isfile(level_file):
-            level_file = os.path.join(base.mainDir, 'levels', name + '.lvl')
+        if self.toggle_interval is not None:
+            self.toggle_interval.pause()
+            self.toggle_interval = None
 
-        level = Level()
+        for pos, tile in self.fallen_tiles.items():
+            if self.has_component(tile, components.Falling):
+                self.remove_component(tile, components.Falling)
+            self.tiles[pos] = tile
+        self.fallen_tiles.clear()
 
-        try:
-            level.read(level_file)
-        except IOError as ex:
-            print("Failed to load level {0}: {1}".format(name, ex))
-            return
+        for path, transform in self.tile_states:
+            path.unstash()
+            path.set_transform(transform)
+
+        self.level.reset()
+
+        spatial = self.component_for_entity(self.player, components.Spatial)
+        spatial.path.set_pos(self.level.entrance[0], self.level.entrance[1], 0)
+        die = self.component_for_entity(self.player, components.Die)
+        die.moves.clear()
+
+        print("Resetting level {0}".format(self.level_name))
+        self.on_level_start()
+
+    def load_level(self, name):
+        self.hud.hide()
+        self.player_control.lock()
+        self.player_control.clear_state()
+
+        level = self.prefetcher.take(name)
+        if level is None:
+            try:
+                level = self.levels.load_level(name)
+            except (IOError, ValueError) as ex:
+                print("Failed to load level {0}: {1}".format(name, ex))
+                return
 
         self.level = level
         self.level_name = name
 
+        # Work out the distance table while the level flies in.
+        thread = threading.Thread(target=level.get_distances, name="distances")
+        thread.daemon = True
+        thread.start()
+
         print("Loading level {0}".format(name))
 
         # Get the current tile that the player is on.
@@ -242,10 +352,12 @@ class World(esper.World):
         #for tile in self.tiles.values():
         #    self.add_component(tile, components.Falling(drag=random() + 0.5))
 
-        self.old_tiles.append(list(self.tiles.values()))
+        self.old_tiles.append(list(self.tiles.values()) + list(self.fallen_tiles.values()))
         self.tiles.clear()
+        self.fallen_tiles.clear()
+        self.tile_states = None
+        self.toggle_interval = None
 
-        self.teleporters.clear()
         self.toggle_tiles.clear()
 
         i = 0
@@ -262,9 +374,6 @@ class World(esper.World):
                 entrance = (x, y)
                 entrance_tile = tile
 
-            if type == TileType.teleporter:
-                self.teleporters.add((x, y))
-
             if type == TileType.active or type == TileType.inactive:
                 self.toggle_tiles.add((x, y))
 
@@ -276,7 +385,7 @@ class World(esper.World):
         if cur_tile is not None:
             cur_tile_path = self.component_for_entity(cur_tile, components.Spatial).path
             entrance_tile_path.set_color_scale(cur_tile_path.get_color_scale())
-            self.delete_entity(cur_tile)
+            self.release_tile(cur_tile)
 
         # Reposition player and the exit tile they rode in on
         self.old_level_root.set_x(self.old_level_root.get_x() + entrance[0] - spatial.x)
@@ -319,21 +428,32 @@ class World(esper.World):
         ).start()
 
     def place_tile(self, x, y, type):
-        tile = self.create_entity()
+        pool = self.tile_pool.get(type)
+        if pool:
+            # Reuse a tile from an earlier level.
+            tile = pool.pop()
+            spatial = self.component_for_entity(tile, components.Spatial)
+            spatial.path.reparent_to(self.level_root)
+            spatial.path.unstash()
+            spatial.path.set_pos_hpr(x, y, 0, 0, 0, 0)
+        else:
+            tile = self.create_entity()
+            self.tile_types[tile] = type
 
-        spatial = components.Spatial("tile", parent=self.level_root, pos=(x, y))
-        self.add_component(tile, spatial)
-        self.add_component(tile, components.Model(type.get_model(), offset=(0, 0, -0.5), scale=0.98))
+            spatial = components.Spatial("tile", parent=self.level_root, pos=(x, y))
+            self.add_component(tile, spatial)
+            self.add_component(tile, components.Model(type.model, offset=(0, 0, -0.5), scale=0.98))
 
-        if type.get_model() == "gfx/tile-cracked.bam":
-            spatial.path.set_h(randint(0, 3) * 90)
-        spatial.path.set_color_scale(type.get_color())
-        if type.get_color()[3] < 1.0:
-            spatial.path.set_transparency(1)
+            if type.color[3] < 1.0:
+                spatial.path.set_transparency(1)
+
+            symbol = type.symbol
+            if symbol:
+                self.add_component(tile, components.Symbol(symbol, color=(0.5, 0, 0, 1), font=base.symbol_font))
 
-        symbol = type.get_symbol()
-        if symbol:
-            self.add_component(tile, components.Symbol(symbol, color=(0.5, 0, 0, 1), font=base.symbol_font))
+        if type == TileType.cracked:
+            spatial.path.set_h(randint(0, 3) * 90)
+        spatial.path.set_color_scale(type.color)
 
         if type == TileType.button:
             spatial.path.set_z(0.07)
@@ -356,3 +476,19 @@ class World(esper.World):
         #glow.reparent_to(render)
 
         return tile
+
+    def release_tile(self, tile):
+        """ Takes a tile that is no longer needed out of the scene, keeping it
+        in the pool for place_tile to reuse, unless the pool for its type is
+        already full, in which case it is deleted. """
+
+        type = self.tile_types[tile]
+        pool = self.tile_pool.setdefault(type, [])
+        if len(pool) < self.max_pooled_tiles:
+            if self.has_component(tile, components.Falling):
+                self.remove_component(tile, components.Falling)
+            self.component_for_entity(tile, components.Spatial).path.detach_node()
+            pool.append(tile)
+        else:
+            del self.tile_types[tile]
+            self.delete_entity(tile)
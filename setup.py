@@ -27,6 +27,8 @@ setup(
                 '.pman',
                 'settings.prc',
                 'levels/*.lvl',
+                'levels/*.lvlc',
+                'levels/*.lvlpack',
                 'README.md',
             },
             'exclude_patterns': {
@@ -0,0 +1,25 @@
+from game.analyse import FIELDS, analyse_level, main
+
+import json
+import os
+
+
+LEVELS_DIR = os.path.join(os.path.dirname(__file__), '..', 'levels')
+
+
+def test_analyse_level():
+    row = analyse_level(os.path.join(LEVELS_DIR, 'level27.lvl'))
+    assert tuple(row.keys()) == FIELDS
+    assert row['level'] == 'level27'
+    assert row['optimal'] == row['par']
+    assert row['solutions'] >= 1
+    assert row['branching'] > 0
+    assert 0 <= row['dead_ends'] < row['states']
+
+
+def test_analyse_main(capsys):
+    files = [os.path.join(LEVELS_DIR, name) for name in ('intro.lvl', 'level0.lvl', 'level1.lvl')]
+    assert main(['--format', 'json', '--sort', 'par', '-j', '1'] + files) == 0
+
+    rows = json.loads(capsys.readouterr().out)
+    assert [row['level'] for row in rows] == ['intro', 'level0', 'level1']
@@ -0,0 +1,102 @@
+from game.bundle import LevelBundle, LevelLibrary, write_bundle, main
+from game.packs import level_packs
+from game.level import Level
+
+import pytest
+import os
+
+
+LEVELS_DIR = os.path.join(os.path.dirname(__file__), '..', 'levels')
+
+
+def write_level(fn, rows, par=None):
+    level = Level()
+    level.parse(rows)
+    level.par = par
+    level.write(fn)
+
+
+def test_bundle_packs(tmp_path):
+    assert main([LEVELS_DIR, '-o', str(tmp_path)]) == 0
+
+    for pack_name, names in level_packs:
+        bundle = LevelBundle(str(tmp_path / (pack_name + '.lvlpack')))
+        assert bundle.get_names() == names
+
+        for name in names:
+            expected = Level()
+            expected.read(os.path.join(LEVELS_DIR, name + '.lvl'))
+
+            level = bundle.load_level(name)
+            assert level.rows == expected.rows
+            assert level.par == expected.par
+            assert len(level.solve()[0]) == level.par
+
+
+def test_bundle_invalid(tmp_path):
+    fn = str(tmp_path / 'bad.lvlpack')
+    with open(fn, 'wb') as fp:
+        fp.write(b'not a bundle')
+
+    with pytest.raises(ValueError):
+        LevelBundle(fn)
+
+
+def test_library(tmp_path):
+    write_level(str(tmp_path / 'a.lvl'), ['b.e'], 2)
+    write_level(str(tmp_path / 'b.lvl'), ['b..e'], 3)
+    write_bundle(str(tmp_path / 'pack.lvlpack'), [('a', str(tmp_path / 'a.lvl')), ('b', str(tmp_path / 'b.lvl'))])
+
+    # The loose file of b was edited after the bundle was built.
+    write_level(str(tmp_path / 'c.lvl'), ['b...e'], 4)
+    bundle_mtime = os.path.getmtime(str(tmp_path / 'pack.lvlpack'))
+    os.utime(str(tmp_path / 'a.lvl'), (bundle_mtime - 10, bundle_mtime - 10))
+    write_level(str(tmp_path / 'b.lvl'), ['b...e'], 4)
+    os.utime(str(tmp_path / 'b.lvl'), (bundle_mtime + 10, bundle_mtime + 10))
+
+    library = LevelLibrary([str(tmp_path / 'missing'), str(tmp_path)])
+    assert isinstance(library.resolve('a'), LevelBundle)
+    assert library.resolve('b') == os.path.join(str(tmp_path), 'b.lvl')
+    assert library.resolve('c') == os.path.join(str(tmp_path), 'c.lvl')
+    assert library.resolve('d') is None
+
+    assert library.load_level('a').par == 2
+    assert library.load_level('b').par == 4
+    assert library.load_level('c').par == 4
+    with pytest.raises(IOError):
+        library.load_level('d')
+
+    # Resolution is cached, even if the files change afterwards.
+    os.remove(str(tmp_path / 'c.lvl'))
+    assert library.resolve('c') == os.path.join(str(tmp_path), 'c.lvl')
+
+
+def test_library_cache(tmp_path):
+    fn = str(tmp_path / 'a.lvl')
+    write_level(fn, ['bx.e'], 3)
+
+    library = LevelLibrary([str(tmp_path)], cache_size=1)
+    level = library.load_level('a')
+    level.remove_tile(1, 0)
+    assert level.crumbled
+
+    # A fresh copy, sharing the graph.
+    again = library.load_level('a')
+    assert again is not level
+    assert again.graph is level.graph
+    assert again.solver is level.solver
+    assert again.solver is not None
+
+    again.get_distances()
+    assert level.solver.distances is not None
+    assert again.rows == ['bx.e']
+    assert again.crumbled == 0
+
+    # Changing the file is noticed.
+    mtime = os.path.getmtime(fn)
+    write_level(fn, ['b..e'], 3)
+    os.utime(fn, (mtime + 10, mtime + 10))
+    changed = library.load_level('a')
+    assert changed.graph is not level.graph
+    assert changed.rows == ['b..e']
+    assert len(library.templates) == 1
@@ -0,0 +1,49 @@
+from game.level import Level
+from game.cache import SolverCache
+
+import os
+
+
+LEVEL_FILE = os.path.join(os.path.dirname(__file__), '..', 'levels', 'level1.lvl')
+
+
+def test_cache(tmp_path):
+    path = str(tmp_path / 'cache.json')
+
+    level = Level()
+    level.read(LEVEL_FILE)
+
+    cache = SolverCache(path)
+    result = cache.get(level)
+    assert result.par == level.par
+    assert len(result.solution) == level.par
+    assert result.count > 0
+    assert result.explored > 0
+    cache.save()
+
+    # A fresh cache should pick up the result without solving.
+    cache = SolverCache(path)
+    level = Level()
+    level.read(LEVEL_FILE)
+    assert level.get_hash() in cache.entries
+    assert cache.get(level) == result
+    assert level.solver is None
+
+
+def test_cache_invalidate(tmp_path):
+    fn = str(tmp_path / 'level.lvl')
+    with open(fn, 'w') as fp:
+        fp.write('# 2\nb.e\n')
+
+    level = Level()
+    level.read(fn)
+    cache = SolverCache(str(tmp_path / 'cache.json'))
+    assert cache.get(level).par == 2
+
+    with open(fn, 'w') as fp:
+        fp.write('# 3\nb..e\n')
+
+    level = Level()
+    level.read(fn)
+    assert level.get_hash() not in cache.entries
+    assert cache.get(level).par == 3
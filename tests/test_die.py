@@ -1,4 +1,4 @@
-from game.die import Die
+from game.die import Die, ORIENTATIONS, ROLL_NORTH, ROLL_EAST, ROLL_SOUTH, ROLL_WEST
 import pytest
 
 
@@ -73,3 +73,25 @@ def test_die_throw():
     assert die.east_number != die.south_number
     assert die.west_number != die.south_number
     assert die.west_number != die.north_number
+
+
+@pytest.mark.parametrize("orientation", range(0, 24))
+def test_die_tables(orientation):
+    assert len(set(ORIENTATIONS)) == 24
+
+    assert ROLL_SOUTH[ROLL_NORTH[orientation]] == orientation
+    assert ROLL_NORTH[ROLL_SOUTH[orientation]] == orientation
+    assert ROLL_WEST[ROLL_EAST[orientation]] == orientation
+    assert ROLL_EAST[ROLL_WEST[orientation]] == orientation
+
+    # The table lookups must agree with the old attribute shuffling.
+    die = Die()
+    die.orientation = orientation
+    top, east, north = die.top_number, die.east_number, die.north_number
+
+    die.rotate_north()
+    assert (die.top_number, die.north_number, die.east_number) == (7 - north, top, east)
+
+    die.orientation = orientation
+    die.rotate_east()
+    assert (die.top_number, die.east_number, die.north_number) == (7 - east, top, north)
@@ -0,0 +1,45 @@
+from game.generate import GeneratorOptions, evaluate_layout, generate_batch
+from game.level import Level
+
+
+OPTIONS = GeneratorOptions(width=6, height=6, area=16, min_par=6, max_par=30, max_solutions=2, teleporter_chance=0.3)
+
+
+def test_generate():
+    accepted, count = generate_batch((1234, 100, OPTIONS))
+    assert count == 100
+    assert len(accepted) > 0
+
+    for rows, par in accepted:
+        level = Level()
+        level.parse(rows)
+        solutions = list(level.iter_solutions())
+        assert len(solutions) <= OPTIONS.max_solutions
+        assert len(solutions[0]) == par
+        assert OPTIONS.min_par <= par <= OPTIONS.max_par
+
+        for landing, slide in zip(level.graph.landings, level.graph.slides):
+            assert landing >= 0 or not slide
+
+
+def test_generate_write(tmp_path):
+    accepted, count = generate_batch((5678, 100, OPTIONS))
+    rows, par = accepted[0]
+
+    level = Level()
+    level.parse(rows)
+    level.par = par
+    fn = str(tmp_path / 'generated.lvl')
+    level.write(fn)
+
+    level = Level()
+    level.read(fn)
+    assert level.par == par
+    assert level.rows == rows
+    assert len(level.solve()[0]) == par
+
+
+def test_generate_ice_off_edge():
+    options = OPTIONS._replace(min_par=1)
+    assert evaluate_layout(['b.e', '  .'], options) is not None
+    assert evaluate_layout(['b.e', 'ss.'], options) is None
@@ -0,0 +1,67 @@
+from game.level import Level, TileType
+from game.die import Die
+from game.hint import HintSolver
+
+import os
+import time
+
+
+LEVEL_FILE = os.path.join(os.path.dirname(__file__), '..', 'levels', 'level27.lvl')
+
+
+def wait_for_hint(hint, timeout=10.0):
+    end_time = time.time() + timeout
+    while time.time() < end_time:
+        moves = hint.poll()
+        if moves is not None:
+            return moves
+        time.sleep(0.001)
+
+
+def test_hint():
+    level = Level()
+    level.read(LEVEL_FILE)
+
+    hint = HintSolver()
+    hint.start(level, level.entrance, Die())
+    assert hint.pending
+
+    moves = wait_for_hint(hint)
+    assert len(moves) == level.par
+    assert not hint.pending
+
+
+def test_hint_cancel():
+    level = Level()
+    level.read(LEVEL_FILE)
+
+    hint = HintSolver()
+    hint.start(level, level.entrance, Die())
+    hint.cancel()
+    assert not hint.pending
+    assert wait_for_hint(hint, timeout=0.1) is None
+
+
+def test_hint_crumbled():
+    level = Level()
+    level.read(LEVEL_FILE)
+
+    assert level.crumbled == 0
+
+    # Knock out every cracked tile; level27 can't be done without them.
+    for pos, cell in level.cells.items():
+        if cell.type == TileType.cracked:
+            level.remove_tile(*pos)
+
+    assert level.crumbled == (1 << len(level.crack_bits)) - 1
+    assert level.solve_from(level.entrance, Die(), crumbled=level.crumbled) == []
+
+
+def test_hint_off_level():
+    level = Level()
+    level.read(LEVEL_FILE)
+
+    hint = HintSolver()
+    hint.start(level, (-1, -1), Die())
+    assert wait_for_hint(hint) == []
+    assert not hint.pending
@@ -1,15 +1,201 @@
-from game.level import Level
+from game.level import Level, TileType
+from game.die import Die
+from game.solver import ENGINES, ARROWS, UNREACHABLE
 
 from glob import glob
 import pytest
 import os
 
 
+def replay(level, path):
+    "Plays out a solution on the cell graph, returns whether it ends on an exit."
+
+    cell = level.begin_cell
+    die = Die()
+    toggle_state = False
+    cracked = set()
+
+    for arrow in path:
+        if cell.type == TileType.cracked:
+            cracked.add(cell)
+
+        dir = ARROWS.index(arrow)
+        (die.rotate_north, die.rotate_east, die.rotate_south, die.rotate_west)[dir]()
+        cell = cell.neighbors[dir]
+        if cell is None or cell in cracked:
+            return False
+        if not cell.type.is_passable(die.bottom_number, toggle_state):
+            return False
+        if cell.type == TileType.button:
+            toggle_state = not toggle_state
+
+    return cell.type == TileType.exit
+
+
+@pytest.mark.parametrize("engine", ENGINES)
 @pytest.mark.parametrize("fn", glob(os.path.join(os.path.dirname(__file__), '..', 'levels', '*.lvl')))
-def test_level(fn):
+def test_level(fn, engine):
     level = Level()
     level.read(fn)
 
-    solutions = level.solve()
+    solutions = level.solve(engine)
     assert len(solutions) > 0
     assert level.par == len(solutions[0])
+    assert replay(level, solutions[0])
+
+
+@pytest.mark.parametrize("fn", glob(os.path.join(os.path.dirname(__file__), '..', 'levels', '*.lvl')))
+def test_level_solutions(fn):
+    level = Level()
+    level.read(fn)
+
+    count = level.count_optimal_solutions()
+    solutions = list(level.iter_solutions())
+    assert count > 0
+    assert len(solutions) == count
+    assert len(set(solutions)) == count
+
+    for solution in solutions:
+        assert len(solution) == level.par
+        assert replay(level, solution)
+
+
+@pytest.mark.parametrize("fn", glob(os.path.join(os.path.dirname(__file__), '..', 'levels', '*.lvl')))
+def test_level_distances(fn):
+    level = Level()
+    level.read(fn)
+
+    assert level.get_moves_left(level.entrance, Die()) is None
+    level.get_distances()
+
+    moves_left = level.get_moves_left(level.entrance, Die())
+    if level.solver.num_cracked == 0:
+        assert moves_left == level.par
+    else:
+        assert moves_left <= level.par
+
+
+def test_level_distances_off_level():
+    level = Level()
+    level.parse(['bss', '  e'])
+    level.get_distances()
+
+    # Sliding east runs off the edge of the level.
+    move = level.get_move(*level.entrance, 1)
+    assert move.target == (3, 0)
+    assert level.get_moves_left(move.target, Die()) == UNREACHABLE
+    assert level.get_moves_left((-5, 10), Die()) == UNREACHABLE
+
+
+def test_level_no_entrance():
+    level = Level()
+    with pytest.raises(ValueError):
+        level.parse(['# 1', ' ..e'])
+
+
+def test_level_long_path():
+    # Far longer than the recursion limit.
+    length = 5000
+    level = Level()
+    level.parse(['b' + '.' * length + 'e'])
+
+    assert len(level.graph) == length + 2
+    assert level.solve('bfs') == ['⇨' * (length + 1)]
+
+
+@pytest.mark.parametrize("rows,pos,dir,move", [
+    (['b.'], (0, 0), 1, ((1, 0), 0, False)),
+    (['b'], (0, 0), 3, ((-1, 0), 0, False)),
+    (['bss.'], (0, 0), 1, ((3, 0), 2, False)),
+    (['bss'], (0, 0), 1, ((3, 0), 2, False)),
+    (['bst..t'], (0, 0), 1, ((5, 0), 1, True)),
+    (['b', 's', 's', 'e'], (0, 0), 0, ((0, 3), 2, False)),
+    # Starting from a spot that isn't a tile.
+    (['bss'], (3, 0), 3, ((0, 0), 2, False)),
+    (['b'], (5, 5), 0, ((5, 6), 0, False)),
+    (['bt.t'], (1, 1), 2, ((3, 0), 0, True)),
+])
+def test_level_get_move(rows, pos, dir, move):
+    level = Level()
+    level.parse(rows)
+
+    assert level.get_move(*pos, dir) == move
+
+
+@pytest.mark.parametrize("rows,allowed", [
+    (['b.'], True),
+    (['b'], False),
+    (['bss'], False),
+    (['bs4'], True),
+    (['bs2'], False),
+    (['bs/'], True),
+    (['bs\\'], False),
+])
+def test_level_landing_tile(rows, allowed):
+    # Rolling east from the start puts the 4 at the bottom.
+    level = Level()
+    level.parse(rows)
+
+    move = level.get_move(*level.entrance, 1)
+    assert level.get_landing_tile(move).is_passable(4) == allowed
+
+    # The solver has to agree on whether the move can be made.
+    solver = level.get_solver()
+    state = solver.pack(0, Die().orientation, 0, 0)
+    assert any(dir == 1 for dir, nstate in solver.successors(state)) == allowed
+
+
+def test_level_grid():
+    level = Level()
+    level.parse(['# 3', '', 'b.x', ' 1', '..e'])
+
+    assert level.rows == ['b.x', ' 1', '..e']
+    assert level.get_tile(2, 0) == TileType.cracked
+    assert level.get_tile(1, 1) == TileType.gate1
+    assert level.get_tile(0, 1) == TileType.void
+    assert level.get_tile(2, 1) == TileType.void
+    assert level.get_tile(-1, 0) == TileType.void
+    assert level.get_tile(3, 2) == TileType.void
+    assert level.get_tile(0, 3) == TileType.void
+    assert level.get_tile(0, 5) == TileType.void
+    assert level.get_tile(5, 0) == TileType.void
+    assert level.get_tile(-3, 1) == TileType.void
+    assert level.check_obstacle(5, 0, 1)
+    assert level.check_obstacle(1, 1, 2)
+    assert not level.check_obstacle(1, 1, 1)
+
+    level.remove_tile(2, 0)
+    assert level.get_tile(2, 0) == TileType.void
+    assert level.crumbled == 1
+    assert level.rows == ['b.', ' 1', '..e']
+
+
+@pytest.mark.parametrize("type", list(TileType))
+def test_tile_type_passable(type):
+    for toggle_state in (False, True):
+        for number in range(1, 7):
+            if type == TileType.void:
+                expected = False
+            elif type.value in '123456':
+                expected = int(type.value) == number
+            elif type == TileType.active:
+                expected = not toggle_state
+            elif type == TileType.inactive:
+                expected = toggle_state
+            else:
+                expected = True
+
+            assert type.is_passable(number, toggle_state) == expected
+
+
+def test_level_reset():
+    level = Level()
+    level.parse(['bxx.e'])
+
+    level.remove_tile(1, 0)
+    level.remove_tile(2, 0)
+    assert level.rows == ['b  .e']
+
+    level.reset()
+    assert level.rows == ['bxx.e']
+    assert level.crumbled == 0
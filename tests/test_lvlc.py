@@ -0,0 +1,93 @@
+from game.level import Level
+from game.lvlc import main, compile_level, read_compiled, load_compiled, get_compiled_path
+from game.hint import HintSolver
+from game.die import Die
+
+from glob import glob
+import pytest
+import os
+
+
+LEVELS_DIR = os.path.join(os.path.dirname(__file__), '..', 'levels')
+
+
+@pytest.mark.parametrize("fn", glob(os.path.join(LEVELS_DIR, '*.lvl')))
+def test_lvlc(fn, tmp_path):
+    output = compile_level(fn, str(tmp_path / 'level.lvlc'))
+
+    level = Level()
+    level.read(fn)
+    compiled = read_compiled(output)
+
+    assert compiled.rows == level.rows
+    assert compiled.par == level.par
+    assert compiled.entrance == level.entrance
+    assert compiled.teleporters == level.teleporters
+    assert compiled.crack_bits == level.crack_bits
+    assert compiled.solution is None
+
+    graph = level.graph
+    compiled_graph = compiled.graph
+    assert compiled_graph.crack_bits == graph.crack_bits
+    for attr in ('grid_cells', 'offsets', 'types', 'landings', 'slides', 'teleports'):
+        assert list(getattr(compiled_graph, attr)) == list(getattr(graph, attr))
+
+    assert len(compiled.solve()[0]) == level.par
+
+
+def test_lvlc_solution(tmp_path):
+    fn = str(tmp_path / 'level.lvl')
+    with open(fn, 'w') as fp:
+        fp.write('# 3\nb..\n  e\n')
+
+    assert main([fn, '--solution']) == 0
+    level = read_compiled(get_compiled_path(fn))
+    assert level.solution == '⇨⇨⇧'
+
+    # The hint for the start comes straight from the file.
+    hint = HintSolver()
+    hint.start(level, level.entrance, Die())
+    assert hint.poll() == ['E', 'E', 'N']
+
+
+def test_lvlc_recompile(tmp_path):
+    fn = str(tmp_path / 'level.lvl')
+    with open(fn, 'w') as fp:
+        fp.write('b.e\n')
+
+    level = read_compiled(compile_level(fn))
+
+    # The loaded level still refers to the old file.
+    with open(fn, 'w') as fp:
+        fp.write('b..e\n')
+    compiled_fn = compile_level(fn)
+
+    assert level.solve() == ['⇨⇨']
+    assert read_compiled(compiled_fn).solve() == ['⇨⇨⇨']
+    assert sorted(os.listdir(str(tmp_path))) == ['level.lvl', 'level.lvlc']
+
+
+def test_lvlc_invalid(tmp_path):
+    fn = str(tmp_path / 'level.lvlc')
+    with open(fn, 'wb') as fp:
+        fp.write(b'b.e\n' * 20)
+
+    with pytest.raises(ValueError):
+        read_compiled(fn)
+
+
+def test_lvlc_truncated(tmp_path):
+    fn = str(tmp_path / 'level.lvl')
+    with open(fn, 'w') as fp:
+        fp.write('# 3\nb..\n  e\n')
+
+    main([fn, '--solution'])
+    with open(get_compiled_path(fn), 'rb') as fp:
+        data = fp.read()
+
+    # Only the padding after the solution may go missing.
+    data = data.rstrip(b'\0')
+    assert load_compiled(memoryview(data)).solution == '⇨⇨⇧'
+    for size in range(len(data)):
+        with pytest.raises(ValueError):
+            load_compiled(memoryview(data[:size]))
@@ -0,0 +1,29 @@
+from game.bundle import LevelLibrary
+from game.prefetch import LevelPrefetcher
+
+import os
+
+
+LEVELS_DIR = os.path.join(os.path.dirname(__file__), '..', 'levels')
+
+
+def test_prefetch():
+    prefetcher = LevelPrefetcher(LevelLibrary([LEVELS_DIR]))
+    prefetcher.start('level1')
+
+    # Asking for another level doesn't disturb it.
+    assert prefetcher.take('level2') is None
+
+    level = prefetcher.take('level1')
+    assert level is not None
+    assert level.graph is not None and level.solver is not None
+    assert len(level.solve()[0]) == level.par
+
+    # It is only handed out once.
+    assert prefetcher.take('level1') is None
+
+
+def test_prefetch_missing():
+    prefetcher = LevelPrefetcher(LevelLibrary([LEVELS_DIR]))
+    prefetcher.start('nonexistent')
+    assert prefetcher.take('nonexistent') is None
@@ -0,0 +1,43 @@
+from game.validate import main
+
+from glob import glob
+import json
+import os
+
+
+LEVELS_DIR = os.path.join(os.path.dirname(__file__), '..', 'levels')
+
+
+def test_validate(capsys):
+    assert main([LEVELS_DIR, '-j', '2']) == 0
+
+    results = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert len(results) == len(glob(os.path.join(LEVELS_DIR, '*.lvl')))
+    for result in results:
+        assert result['ok']
+        assert result['par'] == result['computed']
+
+
+def test_validate_mismatch(tmp_path, capsys):
+    fn = str(tmp_path / 'level.lvl')
+    with open(fn, 'w') as fp:
+        fp.write('# 3\nb.e\n')
+
+    assert main([fn, '-j', '1']) == 1
+
+    result = json.loads(capsys.readouterr().out)
+    assert not result['ok']
+    assert result['par'] == 3
+    assert result['computed'] == 2
+
+
+def test_validate_no_entrance(tmp_path, capsys):
+    fn = str(tmp_path / 'level.lvl')
+    with open(fn, 'w') as fp:
+        fp.write('# 1\n.e\n')
+
+    assert main([fn, '-j', '1']) == 1
+
+    result = json.loads(capsys.readouterr().out)
+    assert not result['ok']
+    assert result['error'].startswith('ValueError')